@@ -0,0 +1,77 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+
+CACHE_PATH = os.getenv("AI_CACHE_PATH", os.path.join(os.getcwd(), 'analysis_cache.sqlite3'))
+CACHE_TTL = int(os.getenv("AI_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+
+
+def text_fingerprint(text):
+    """SHA-256 du texte extrait normalisé (casse et espaces ignorés)."""
+    normalized = re.sub(r"\s+", " ", text).strip().lower()
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+class AnalysisCache:
+    """Cache persistant (SQLite) des analyses de CV.
+
+    Chaque analyse est enregistrée sous deux clés : le hash du PDF et le
+    hash du texte extrait normalisé. Une entrée n'est valable que pour la
+    version du prompt qui l'a produite et pendant CACHE_TTL secondes.
+    """
+
+    def __init__(self, prompt_version, path=CACHE_PATH, ttl=CACHE_TTL):
+        self.prompt_version = prompt_version
+        self.path = path
+        self.ttl = ttl
+        self.hits = {'pdf': 0, 'text': 0}
+        self.misses = 0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS analyses (
+                    key TEXT PRIMARY KEY,
+                    prompt_version TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    result TEXT NOT NULL
+                )""")
+            # Entrées périmées ou produites par un ancien prompt
+            conn.execute("DELETE FROM analyses WHERE prompt_version != ? OR created_at < ?",
+                         (prompt_version, time.time() - ttl))
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, pdf_hash=None, text_hash=None):
+        """Retourne (résultat, type de clé) ou (None, None)."""
+        min_created = time.time() - self.ttl
+        with self._connect() as conn:
+            for kind, digest in (('pdf', pdf_hash), ('text', text_hash)):
+                if not digest:
+                    continue
+                row = conn.execute(
+                    "SELECT result FROM analyses WHERE key = ? AND prompt_version = ? AND created_at >= ?",
+                    (f"{kind}:{digest}", self.prompt_version, min_created)
+                ).fetchone()
+                if row:
+                    self.hits[kind] += 1
+                    return json.loads(row[0]), kind
+        if text_hash:
+            self.misses += 1
+        return None, None
+
+    def put(self, result, pdf_hash=None, text_hash=None):
+        payload = json.dumps(result, ensure_ascii=False)
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO analyses (key, prompt_version, created_at, result) VALUES (?, ?, ?, ?)",
+                [(f"{kind}:{digest}", self.prompt_version, now, payload)
+                 for kind, digest in (('pdf', pdf_hash), ('text', text_hash)) if digest]
+            )
+
+    def stats(self):
+        return {'hits': dict(self.hits), 'misses': self.misses, 'prompt_version': self.prompt_version}
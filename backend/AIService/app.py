@@ -1,61 +1,107 @@
-from flask import Flask, request, jsonify
+import time
+_import_started = time.perf_counter()
+
+from flask import Flask, request, jsonify, has_request_context
 import os, requests
 from dotenv import load_dotenv
-import google.generativeai as genai
-import PyPDF2
-import firebase_admin
-from firebase_admin import credentials, firestore
 from flask_cors import CORS
 import re
+import sys
+import threading
+import json
+import hashlib
+import tempfile
+from urllib.parse import quote
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-# --- Chargement variables d’environnement ---
+# --- Chargement variables d’environnement (avant les modules locaux qui lisent os.getenv à l'import) ---
 load_dotenv()
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from common.bootstrap import Lazy, firestore_client, gemini_model, startup
+from common.skills import canonicalize_skills
+from common.pagination import InvalidCursor, decode_cursor, encode_cursor
+from analysis_cache import AnalysisCache, text_fingerprint
+from batch_queue import BatchQueue
+from rate_limiter import TokenBucket
+from metrics import ModelMetrics
+from local_extractor import EXTRACTOR_VERSION, extract_local
+from pdf_extractor import PdfTextExtractor, truncate_to_budget
+from search_index import SearchIndex
+
 # --- Config Flask ---
 app = Flask(__name__)
-CORS(app)
-UPLOAD_FOLDER = os.path.join(os.getcwd(), 'uploads')
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+CORS(app, expose_headers=['X-Next-Cursor'])
 
-# --- Initialisation Firebase ---
-cred = credentials.Certificate("../../firebase/firebase_admin_key.json")
-firebase_admin.initialize_app(cred)
-db = firestore.client()
-print("Firebase initialisé")
+# --- Pool d'extraction PDF (hôte forké au chargement, avant Firebase) ---
+pdf_extractor = PdfTextExtractor()
 
-# --- Config Gemini ---
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-model = genai.GenerativeModel("gemini-1.5-flash")
+# --- Firebase et Gemini : clients créés au premier usage ---
+db = Lazy(firestore_client)
+MODEL_NAME = "gemini-1.5-flash"
+model = Lazy(lambda: gemini_model(MODEL_NAME))
 
 # --- Téléchargement du CV via CVService ---
+CVSERVICE_URL = os.getenv("CVSERVICE_URL", "http://localhost:5001")
+# Taille max acceptée, et seuil au-delà duquel le PDF passe de la RAM à un fichier temporaire
+MAX_CV_BYTES = int(os.getenv("AI_MAX_CV_BYTES", str(20 * 1024 * 1024)))
+SPOOL_MAX_BYTES = int(os.getenv("AI_SPOOL_MAX_BYTES", str(5 * 1024 * 1024)))
+DOWNLOAD_TIMEOUT = (3.05, 30)   # (connexion, lecture) en secondes
+CHUNK_SIZE = 64 * 1024
+
+# Session HTTP partagée : connexions keep-alive réutilisées + retries
+http_session = requests.Session()
+http_session.mount("http://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504],
+                      allowed_methods=["GET"])
+))
+
 def download_cv_from_cvservice(filename):
-    url = f"http://localhost:5001/cv/download/{filename}"
-    local_path = os.path.join(UPLOAD_FOLDER, filename)
+    """Retourne (fichier en mémoire, sha256) ou (None, None).
+
+    Le PDF est lu par morceaux dans un SpooledTemporaryFile : il reste en
+    mémoire sous SPOOL_MAX_BYTES et bascule sinon sur un fichier temporaire
+    supprimé à la fermeture. Rien n'est écrit dans uploads/.
+    """
+    url = f"{CVSERVICE_URL}/cv/download/{quote(filename)}"
+    buffer = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
     try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            with open(local_path, "wb") as f:
-                f.write(response.content)
-            return local_path
-        print("Erreur HTTP:", response.status_code)
-        return None
+        with http_session.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+            if response.status_code != 200:
+                print("Erreur HTTP:", response.status_code)
+                buffer.close()
+                return None, None
+            if int(response.headers.get("Content-Length") or 0) > MAX_CV_BYTES:
+                print("CV trop volumineux:", response.headers.get("Content-Length"))
+                buffer.close()
+                return None, None
+
+            digest = hashlib.sha256()
+            size = 0
+            for chunk in response.iter_content(CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_CV_BYTES:
+                    print("CV trop volumineux:", size)
+                    buffer.close()
+                    return None, None
+                digest.update(chunk)
+                buffer.write(chunk)
+        buffer.seek(0)
+        return buffer, digest.hexdigest()
     except Exception as e:
         print("Erreur téléchargement:", e)
-        return None
+        buffer.close()
+        return None, None
 
 # --- Extraction texte PDF ---
-def extract_text_from_pdf(filepath):
-    try:
-        with open(filepath, 'rb') as f:
-            reader = PyPDF2.PdfReader(f)
-            return ''.join(page.extract_text() or '' for page in reader.pages).strip()
-    except Exception as e:
-        print("Erreur PDF:", e)
-        return ""
+def extract_text_from_pdf(pdf_file):
+    return pdf_extractor.extract(pdf_file)
 
 # --- Appel Gemini ---
-def analyze_with_ai(cv_text):
-    prompt = f"""
+PROMPT_TEMPLATE = """
 Analyse le CV ci-dessous et retourne les informations dans ce format EXACT :
 
 === Compétences ===
@@ -73,11 +119,118 @@ Court résumé du profil du candidat en 3 à 5 phrases.
 Voici le CV :
 {cv_text}
 """
+
+# Mode de sortie : 'text' (format libre ci-dessus, par défaut) ou 'json' (réponse
+# contrainte par un schéma puis validée, activée avec AI_OUTPUT_MODE=json)
+AI_OUTPUT_MODE = os.getenv("AI_OUTPUT_MODE", "text")
+
+JSON_PROMPT_TEMPLATE = """
+Analyse le CV ci-dessous et retourne un objet JSON avec :
+- "skills" : les compétences techniques du candidat (10 au plus), par exemple "Python", "Django"
+- "experience" : une phrase de la forme "X années d'expérience dans le domaine Y."
+- "summary" : un court résumé du profil du candidat en 3 à 5 phrases.
+
+Voici le CV :
+{cv_text}
+"""
+
+# Réparation d'une sortie invalide : le CV n'est pas renvoyé, seule la réponse fautive l'est
+REPAIR_PROMPT_TEMPLATE = """
+Le JSON ci-dessous ne respecte pas le schéma attendu ({error}).
+Retourne uniquement le JSON corrigé, avec les clés "skills" (liste de chaînes), "experience" et "summary" (chaînes).
+
+{raw}
+"""
+
+ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "skills": {"type": "array", "items": {"type": "string"}},
+        "experience": {"type": "string"},
+        "summary": {"type": "string"}
+    },
+    "required": ["skills", "experience", "summary"]
+}
+
+# Version du prompt (et de l'extracteur local) : toute modification invalide
+# le cache des analyses
+_prompt_definition = (PROMPT_TEMPLATE if AI_OUTPUT_MODE == 'text'
+                      else JSON_PROMPT_TEMPLATE + json.dumps(ANALYSIS_SCHEMA, sort_keys=True))
+_prompt_definition += f"\nlocal-extractor:{EXTRACTOR_VERSION}"
+PROMPT_VERSION = hashlib.sha256((MODEL_NAME + _prompt_definition).encode('utf-8')).hexdigest()[:16]
+analysis_cache = AnalysisCache(PROMPT_VERSION)
+
+# Débit maximal vers l'API Gemini, partagé par les routes et les workers du batch
+GEMINI_RATE_PER_MINUTE = float(os.getenv("GEMINI_RATE_PER_MINUTE", "60"))
+gemini_limiter = TokenBucket(GEMINI_RATE_PER_MINUTE / 60, capacity=max(1, GEMINI_RATE_PER_MINUTE / 6))
+
+# Tokens, latence et retries par endpoint, exposés sur /metrics
+model_metrics = ModelMetrics()
+
+def call_model(prompt, json_mode):
+    """Retourne (texte, tokens du prompt, tokens de sortie)."""
+    gemini_limiter.acquire()
+    config = None
+    if json_mode:
+        config = {"response_mime_type": "application/json", "response_schema": ANALYSIS_SCHEMA}
+    response = model.generate_content(prompt, generation_config=config)
+    usage = getattr(response, 'usage_metadata', None)
+    return (response.text,
+            getattr(usage, 'prompt_token_count', 0) or 0,
+            getattr(usage, 'candidates_token_count', 0) or 0)
+
+def validate_analysis(raw_text):
+    """Valide une réponse JSON du modèle ; lève ValueError si elle est invalide."""
     try:
-        response = model.generate_content(prompt)
-        return {'analysis': getattr(response, 'text', 'Aucune réponse')}
+        data = json.loads(raw_text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"JSON invalide: {e.msg}")
+    if not isinstance(data, dict):
+        raise ValueError("un objet JSON est attendu")
+    skills = data.get("skills")
+    if not isinstance(skills, list) or not all(isinstance(s, str) for s in skills):
+        raise ValueError("'skills' doit être une liste de chaînes")
+    for key in ("experience", "summary"):
+        if not isinstance(data.get(key), str):
+            raise ValueError(f"'{key}' doit être une chaîne")
+
+    skill_list = [s.strip("-• ").strip() for s in skills]
+    skill_list = [s for s in skill_list if s]
+    return {
+        "skills": skill_list[:10] if skill_list else ["Aucune détectée"],
+        "experience": data["experience"].strip() or "Non précisé",
+        "summary": " ".join(data["summary"].split()) or "Résumé non trouvé"
+    }
+
+def analyze_with_ai(cv_text):
+    """Retourne {'parsed': analyse} ou {'error': message}."""
+    json_mode = AI_OUTPUT_MODE == 'json'
+    template = JSON_PROMPT_TEMPLATE if json_mode else PROMPT_TEMPLATE
+    prompt = template.format(cv_text=truncate_to_budget(cv_text))
+    endpoint = request.endpoint if has_request_context() else 'batch'
+    prompt_tokens = output_tokens = retries = 0
+    result = {}
+    started = time.perf_counter()
+    try:
+        raw, p_tokens, o_tokens = call_model(prompt, json_mode)
+        prompt_tokens, output_tokens = prompt_tokens + p_tokens, output_tokens + o_tokens
+        if not json_mode:
+            result = {'parsed': parse_analysis(raw)}
+        else:
+            try:
+                result = {'parsed': validate_analysis(raw)}
+            except ValueError as e:
+                print(f"Sortie JSON invalide ({e}), tentative de réparation")
+                retries = 1
+                raw, p_tokens, o_tokens = call_model(REPAIR_PROMPT_TEMPLATE.format(error=e, raw=raw), True)
+                prompt_tokens, output_tokens = prompt_tokens + p_tokens, output_tokens + o_tokens
+                result = {'parsed': validate_analysis(raw)}
     except Exception as e:
-        return {'error': str(e)}
+        result = {'error': str(e)}
+    finally:
+        model_metrics.record(endpoint, prompt_tokens, output_tokens,
+                             (time.perf_counter() - started) * 1000, retries, error='error' in result)
+    return result
 
 # --- Parsing du texte Gemini ---
 def parse_analysis(raw_text):
@@ -101,6 +254,82 @@ def parse_analysis(raw_text):
         "summary": " ".join(summary.group(1).splitlines()).strip() if summary else "Résumé non trouvé"
     }
 
+# --- Voie rapide locale ---
+# Au-dessus de ce seuil de confiance, l'analyse locale remplace l'appel Gemini
+# (une valeur > 1 désactive la voie rapide)
+LOCAL_CONFIDENCE_THRESHOLD = float(os.getenv("AI_LOCAL_CONFIDENCE_THRESHOLD", "0.8"))
+fast_path_stats = {'local': 0, 'gemini': 0}
+fast_path_lock = threading.Lock()
+
+def analyze_text(cv_text):
+    """Retourne (analyse, source, erreur, résultat cachable)."""
+    parsed, confidence = extract_local(cv_text)
+    if confidence >= LOCAL_CONFIDENCE_THRESHOLD:
+        with fast_path_lock:
+            fast_path_stats['local'] += 1
+        return parsed, 'local', None, True
+
+    with fast_path_lock:
+        fast_path_stats['gemini'] += 1
+    result = analyze_with_ai(cv_text)
+    ai_error = result.get("error")
+    parsed = result["parsed"] if "parsed" in result else parse_analysis(ai_error)
+    # Les échecs (erreur API, format non reconnu) ne sont pas mis en cache
+    cacheable = "parsed" in result and parsed["skills"] != ["Aucune détectée"]
+    return parsed, 'gemini', ai_error, cacheable
+
+# --- Recherche plein texte sur les CV analysés ---
+search_index = SearchIndex()
+
+# --- Pipeline complet : téléchargement -> cache -> extraction -> analyse ---
+class AnalysisError(Exception):
+    def __init__(self, message, status=500):
+        super().__init__(message)
+        self.status = status
+
+def analyze_cv(filename):
+    """Retourne {'cv_id', 'parsed', 'cache', 'source', 'ai_error'} ; lève AnalysisError."""
+    pdf_file, pdf_hash = download_cv_from_cvservice(filename)
+    if pdf_file is None:
+        raise AnalysisError('Download failed', 500)
+
+    with pdf_file:
+        # --- Même PDF déjà analysé ? (hash du fichier)
+        parsed, cache_hit = analysis_cache.get(pdf_hash=pdf_hash)
+        cv_text = extract_text_from_pdf(pdf_file) if parsed is None else None
+
+    ai_error = None
+    source = 'cache'
+    if parsed is None:
+        if not cv_text:
+            raise AnalysisError('PDF text extraction failed', 400)
+
+        # --- Même contenu sous un autre fichier ? (hash du texte normalisé)
+        text_hash = text_fingerprint(cv_text)
+        parsed, cache_hit = analysis_cache.get(text_hash=text_hash)
+
+        if parsed is None:
+            parsed, source, ai_error, cacheable = analyze_text(cv_text)
+            if cacheable:
+                analysis_cache.put(parsed, pdf_hash=pdf_hash, text_hash=text_hash)
+        else:
+            analysis_cache.put(parsed, pdf_hash=pdf_hash)
+
+    cv_id = filename.split("_")[0]
+    parsed["cv_id"] = cv_id
+    # Forme canonique utilisée par MatchingService pour le scoring
+    parsed["skills_canonical"] = canonicalize_skills(
+        s for s in parsed["skills"] if s != "Aucune détectée"
+    )
+    # --- Index plein texte (le texte d'un PDF déjà indexé est réutilisé)
+    if not ai_error:
+        try:
+            search_index.add(cv_id, parsed, text=cv_text, pdf_hash=pdf_hash)
+        except Exception as e:
+            print(f"Erreur indexation recherche {cv_id}: {e}")
+    return {'cv_id': cv_id, 'parsed': parsed, 'cache': cache_hit or 'miss',
+            'source': source, 'ai_error': ai_error}
+
 # --- Route principale ---
 @app.route('/analyze-from-cvservice', methods=['POST'])
 def analyze_from_cvservice():
@@ -109,28 +338,55 @@ def analyze_from_cvservice():
     if not filename:
         return jsonify({'error': 'No filename provided'}), 400
 
-    local_path = download_cv_from_cvservice(filename)
-    if not local_path:
-        return jsonify({'error': 'Download failed'}), 500
-
-    cv_text = extract_text_from_pdf(local_path)
-    if not cv_text:
-        return jsonify({'error': 'PDF text extraction failed'}), 400
-
-    result = analyze_with_ai(cv_text)
-    raw_text = result.get("analysis", result.get("error"))
-    parsed = parse_analysis(raw_text)
+    try:
+        outcome = analyze_cv(filename)
+    except AnalysisError as e:
+        return jsonify({'error': str(e)}), e.status
 
-    cv_id = filename.split("_")[0]
-    parsed["cv_id"] = cv_id
+    cv_id, parsed = outcome['cv_id'], outcome['parsed']
     db.collection("cv_analysis").document(cv_id).set(parsed)
 
     return jsonify({
         'filename': filename,
         'cv_id': cv_id,
-        'parsed_analysis': parsed
+        'parsed_analysis': parsed,
+        'cache': outcome['cache'],
+        'source': outcome['source']
     })
 
+# --- Analyse en lot ---
+def process_batch_item(filename):
+    outcome = analyze_cv(filename)
+    if outcome['ai_error']:
+        # Erreur du modèle (quota, réseau...) : l'élément sera retenté
+        raise AnalysisError(outcome['ai_error'])
+    return outcome['cv_id'], outcome['parsed']
+
+def write_analyses(results):
+    batch = db.batch()
+    for cv_id, parsed in results:
+        batch.set(db.collection("cv_analysis").document(cv_id), parsed)
+    batch.commit()
+
+batch_queue = BatchQueue(process_batch_item, write_analyses)
+
+@app.route('/analyze-batch', methods=['POST'])
+def analyze_batch():
+    data = request.get_json(silent=True) or {}
+    filenames = data.get("filenames")
+    if not filenames or not isinstance(filenames, list):
+        return jsonify({'error': 'No filenames provided'}), 400
+
+    batch_id = batch_queue.submit([str(f) for f in filenames])
+    return jsonify({'batch_id': batch_id, 'total': len(filenames)}), 202
+
+@app.route('/analyze-batch/<batch_id>', methods=['GET'])
+def analyze_batch_status(batch_id):
+    status = batch_queue.status(batch_id)
+    if status is None:
+        return jsonify({'error': 'Batch not found'}), 404
+    return jsonify(status)
+
 @app.route('/get-analysis/<cv_id>', methods=['GET'])
 def get_analysis(cv_id):
     try:
@@ -148,6 +404,45 @@ def get_analysis(cv_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# --- Recherche : /search?q=kubernetes AND 5 years&limit=20&cursor=... ---
+@app.route('/search', methods=['GET'])
+def search_cvs():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'No query provided'}), 400
+    limit = request.args.get('limit', default=20, type=int)
+    try:
+        offset = decode_cursor(request.args.get('cursor')) or 0
+        if not isinstance(offset, int) or offset < 0:
+            raise InvalidCursor("Cursor invalide")
+        results, more = search_index.search(query, limit, offset)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    next_cursor = encode_cursor(offset + len(results)) if more else None
+    headers = {'X-Next-Cursor': next_cursor} if next_cursor else {}
+    return jsonify({'query': query, 'results': results, 'next_cursor': next_cursor}), 200, headers
+
+@app.route('/search/<cv_id>', methods=['DELETE'])
+def remove_from_search(cv_id):
+    if not search_index.remove(cv_id):
+        return jsonify({'error': 'CV not indexed'}), 404
+    return jsonify({'message': 'CV retiré de l’index de recherche'}), 200
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    with fast_path_lock:
+        fast_path = dict(fast_path_stats)
+    fast_path['llm_calls_avoided'] = fast_path['local']
+    fast_path['threshold'] = LOCAL_CONFIDENCE_THRESHOLD
+    return jsonify({**analysis_cache.stats(), 'fast_path': fast_path, 'pdf': pdf_extractor.stats()})
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return jsonify({'output_mode': AI_OUTPUT_MODE, 'model_calls': model_metrics.snapshot()})
+
 # --- Lancement ---
+startup('AIService', _import_started, firestore_client, lambda: gemini_model(MODEL_NAME))
+
 if __name__ == '__main__':
     app.run(port=5003, debug=True)
\ No newline at end of file
@@ -0,0 +1,176 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+QUEUE_PATH = os.getenv("AI_BATCH_DB", os.path.join(os.getcwd(), 'batch_queue.sqlite3'))
+WORKERS = int(os.getenv("AI_BATCH_WORKERS", "4"))
+MAX_ATTEMPTS = 3
+# Au démarrage, un élément 'running'/'writing' n'est repris que s'il n'a pas
+# bougé depuis ce délai : un autre processus (worker gunicorn, reloader) peut
+# être en train de le traiter
+STALE_AFTER = int(os.getenv("AI_BATCH_STALE_SECONDS", "600"))
+# Les analyses terminées sont écrites dans cv_analysis par paquets
+WRITE_BATCH_SIZE = 500
+WRITE_INTERVAL = 2.0
+
+
+class BatchQueue:
+    """File persistante (SQLite) d'analyses de CV, vidée par un pool de workers.
+
+    `process(filename)` retourne (cv_id, analyse) ou lève une exception ;
+    `write(results)` reçoit une liste [(cv_id, analyse)] à écrire en une
+    fois. Un élément n'est marqué 'done' qu'après l'écriture. Chaque prise
+    d'un élément compte une tentative (analyse ou écriture en échec) ; au-delà
+    de MAX_ATTEMPTS il passe en 'error'. Plusieurs processus peuvent partager
+    la file : un élément n'est pris que par un seul. Au démarrage, les
+    éléments restés 'running' depuis STALE_AFTER (arrêt brutal) sont remis
+    en file.
+    """
+
+    def __init__(self, process, write, path=QUEUE_PATH, workers=WORKERS):
+        self.process = process
+        self.write = write
+        self.path = path
+        self._wake = threading.Condition()
+        self._to_write = []   # [(item_id, cv_id, analyse)]
+        self._write_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS batches (
+                    id TEXT PRIMARY KEY,
+                    created_at REAL NOT NULL,
+                    total INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS items (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    batch_id TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    cv_id TEXT,
+                    error TEXT,
+                    updated_at REAL
+                );
+                CREATE INDEX IF NOT EXISTS items_status ON items (status, id);
+                CREATE INDEX IF NOT EXISTS items_batch ON items (batch_id, id);
+            """)
+            conn.execute("UPDATE items SET status = 'queued' WHERE status IN ('running', 'writing') "
+                         "AND updated_at < ?", (time.time() - STALE_AFTER,))
+        for i in range(workers):
+            threading.Thread(target=self._work, name=f'batch-worker-{i}', daemon=True).start()
+        threading.Thread(target=self._flush_loop, name='batch-writer', daemon=True).start()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    # --- API ---
+    def submit(self, filenames):
+        batch_id = str(uuid.uuid4())
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("INSERT INTO batches (id, created_at, total) VALUES (?, ?, ?)",
+                         (batch_id, now, len(filenames)))
+            conn.executemany("INSERT INTO items (batch_id, filename, updated_at) VALUES (?, ?, ?)",
+                             [(batch_id, f, now) for f in filenames])
+        with self._wake:
+            self._wake.notify_all()
+        return batch_id
+
+    def status(self, batch_id):
+        with self._connect() as conn:
+            batch = conn.execute("SELECT created_at, total FROM batches WHERE id = ?", (batch_id,)).fetchone()
+            if batch is None:
+                return None
+            rows = conn.execute(
+                "SELECT filename, status, cv_id, error, attempts FROM items WHERE batch_id = ? ORDER BY id",
+                (batch_id,)
+            ).fetchall()
+        counts = {}
+        for row in rows:
+            counts[row[1]] = counts.get(row[1], 0) + 1
+        finished = counts.get('done', 0) + counts.get('error', 0)
+        return {
+            'batch_id': batch_id,
+            'created_at': batch[0],
+            'total': batch[1],
+            'counts': counts,
+            'progress': round(finished / batch[1] * 100, 2) if batch[1] else 100.0,
+            'items': [
+                {'filename': r[0], 'status': r[1], 'cv_id': r[2], 'error': r[3], 'attempts': r[4]}
+                for r in rows
+            ]
+        }
+
+    # --- Workers ---
+    def _claim(self):
+        # UPDATE conditionnel : si un autre thread ou processus a pris l'élément
+        # entre le SELECT et l'UPDATE, rowcount vaut 0 et on passe au suivant
+        with self._connect() as conn:
+            while True:
+                row = conn.execute("SELECT id, filename, attempts FROM items WHERE status = 'queued' "
+                                   "ORDER BY id LIMIT 1").fetchone()
+                if row is None:
+                    return None
+                claimed = conn.execute(
+                    "UPDATE items SET status = 'running', attempts = attempts + 1, updated_at = ? "
+                    "WHERE id = ? AND status = 'queued'", (time.time(), row[0])
+                ).rowcount
+                conn.commit()
+                if claimed:
+                    return row
+
+    def _set_status(self, item_id, status, error=None, cv_id=None):
+        with self._connect() as conn:
+            conn.execute("UPDATE items SET status = ?, error = ?, cv_id = COALESCE(?, cv_id), updated_at = ? "
+                         "WHERE id = ?", (status, error, cv_id, time.time(), item_id))
+
+    def _work(self):
+        while True:
+            item = self._claim()
+            if item is None:
+                with self._wake:
+                    self._wake.wait(timeout=5)
+                continue
+            item_id, filename, attempts = item
+            try:
+                cv_id, analysis = self.process(filename)
+                self._set_status(item_id, 'writing', cv_id=cv_id)
+                with self._write_lock:
+                    self._to_write.append((item_id, cv_id, analysis))
+            except Exception as e:
+                retry = attempts + 1 < MAX_ATTEMPTS
+                print(f"Erreur analyse batch {filename} (tentative {attempts + 1}): {e}")
+                self._set_status(item_id, 'queued' if retry else 'error', error=str(e))
+                if retry:
+                    time.sleep(2 ** attempts)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(WRITE_INTERVAL)
+            with self._write_lock:
+                pending, self._to_write = self._to_write, []
+            for i in range(0, len(pending), WRITE_BATCH_SIZE):
+                chunk = pending[i:i + WRITE_BATCH_SIZE]
+                try:
+                    self.write([(cv_id, analysis) for _, cv_id, analysis in chunk])
+                    error = None
+                except Exception as e:
+                    print(f"Erreur écriture batch cv_analysis: {e}")
+                    error = str(e)
+                with self._connect() as conn:
+                    if error is None:
+                        conn.executemany("UPDATE items SET status = 'done', error = NULL, updated_at = ? "
+                                         "WHERE id = ?", [(time.time(), item_id) for item_id, _, _ in chunk])
+                    else:
+                        # Remis en file tant qu'il reste des tentatives, abandonné ensuite
+                        conn.executemany(
+                            "UPDATE items SET status = CASE WHEN attempts >= ? THEN 'error' ELSE 'queued' END, "
+                            "error = ?, updated_at = ? WHERE id = ?",
+                            [(MAX_ATTEMPTS, error, time.time(), item_id) for item_id, _, _ in chunk]
+                        )
+                if error is not None:
+                    with self._wake:
+                        self._wake.notify_all()
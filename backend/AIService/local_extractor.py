@@ -0,0 +1,223 @@
+"""Extraction locale (sans LLM) des compétences, de l'expérience et du résumé d'un CV."""
+import re
+import unicodedata
+from collections import Counter, deque
+from datetime import date
+
+from common.skills import SKILL_ALIASES, fold
+
+# Alias trop courts ("c", "r", "go", "ia") : seulement dans la section compétences
+SHORT_ALIAS_LEN = 2
+MAX_SKILLS = 10
+# Incrémenté quand les règles ou le calcul de confiance changent : fait
+# partie de la version du cache des analyses
+EXTRACTOR_VERSION = 2
+
+SECTION_TITLES = {
+    'skills': ["competences", "competences techniques", "skills", "technical skills",
+               "compétences clés", "outils", "technologies", "langages", "savoir-faire"],
+    'experience': ["experience", "experiences", "experience professionnelle",
+                   "experiences professionnelles", "work experience", "parcours professionnel",
+                   "professional experience", "stages"],
+    'summary': ["profil", "resume", "summary", "a propos", "about me", "about",
+                "objectif", "objectif professionnel", "profile", "presentation"],
+    'other': ["formation", "education", "diplomes", "langues", "languages",
+              "certifications", "projets", "projects", "loisirs", "centres d'interet",
+              "interests", "references", "contact"],
+}
+
+_YEARS = re.compile(
+    r"(\d{1,2})\s*\+?\s*(?:ans|annees|years?)\s+(?:d'|de |of )?\s*(?:experience|exp\b)")
+_RANGE = re.compile(
+    r"\b((?:19|20)\d{2})\s*(?:-|–|—|a|to|au|jusqu'a)\s*((?:19|20)\d{2}|present|aujourd'hui|"
+    r"actuel|actuellement|now|current|en cours)")
+
+
+class AhoCorasick:
+    def __init__(self, patterns):
+        """patterns : {motif: valeur}."""
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        for pattern, value in patterns.items():
+            node = 0
+            for ch in pattern:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                node = nxt
+            self.out[node].append((len(pattern), value))
+
+        # Liens d'échec en largeur ; les fils de la racine échouent vers la racine
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                if node:
+                    self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def finditer(self, text):
+        """(début, fin, valeur) pour chaque occurrence, chevauchements compris."""
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            for length, value in self.out[node]:
+                yield i - length + 1, i + 1, value
+
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch in "+#"
+
+
+_PATTERNS = {}
+for _canonical, _aliases in SKILL_ALIASES.items():
+    for _alias in [_canonical] + _aliases:
+        _PATTERNS[fold(_alias)] = _canonical
+_AUTOMATON = AhoCorasick(_PATTERNS)
+
+
+def _fold_with_offsets(text):
+    """Texte plié + position d'origine de chaque caractère plié."""
+    folded, offsets = [], []
+    for i, ch in enumerate(text):
+        for c in unicodedata.normalize("NFKD", ch):
+            if not unicodedata.combining(c):
+                folded.append(c.lower())
+                offsets.append(i)
+    return ''.join(folded), offsets
+
+
+def _find_skills(folded, offsets, text, ranges_allow_short):
+    """Occurrences non chevauchantes, la plus longue gagne."""
+    matches = []
+    for start, end, canonical in _AUTOMATON.finditer(folded):
+        if start > 0 and _is_word_char(folded[start - 1]):
+            continue
+        if end < len(folded) and _is_word_char(folded[end]):
+            continue
+        if end - start <= SHORT_ALIAS_LEN and not any(a <= start < b for a, b in ranges_allow_short):
+            continue
+        matches.append((start, end, canonical))
+    matches.sort(key=lambda m: (m[0], -(m[1] - m[0])))
+
+    found = []
+    last_end = -1
+    for start, end, canonical in matches:
+        if start < last_end:
+            continue
+        last_end = end
+        label = text[offsets[start]:offsets[end - 1] + 1].strip()
+        found.append((start, canonical, label))
+    return found
+
+
+def _sections(folded):
+    """{nom: [(début, fin)]} à partir des lignes-titres reconnues."""
+    titles = {fold(t): name for name, items in SECTION_TITLES.items() for t in items}
+    heads = []
+    pos = 0
+    for line in folded.split('\n'):
+        key = line.strip(" :-•*=#|").strip()
+        if key in titles and len(key) < 40:
+            heads.append((pos, pos + len(line) + 1, titles[key]))
+        pos += len(line) + 1
+    sections = {}
+    for i, (_, body_start, name) in enumerate(heads):
+        body_end = heads[i + 1][0] if i + 1 < len(heads) else len(folded)
+        sections.setdefault(name, []).append((body_start, body_end))
+    return sections
+
+
+def _years_of_experience(folded, sections):
+    explicit = [int(m.group(1)) for m in _YEARS.finditer(folded) if int(m.group(1)) < 50]
+    if explicit:
+        return max(explicit)
+
+    # Sinon : union des périodes datées de la section expérience
+    spans = sections.get('experience') or [(0, len(folded))]
+    this_year = date.today().year
+    periods = []
+    for start, end in spans:
+        for m in _RANGE.finditer(folded[start:end]):
+            begin = int(m.group(1))
+            finish = int(m.group(2)) if m.group(2)[:2] in ("19", "20") else this_year
+            if begin <= finish <= this_year:
+                periods.append((begin, finish))
+    if not periods:
+        return None
+    periods.sort()
+    total, cur_start, cur_end = 0, None, None
+    for begin, finish in periods:
+        if cur_end is None or begin > cur_end:
+            if cur_end is not None:
+                total += cur_end - cur_start
+            cur_start, cur_end = begin, finish
+        else:
+            cur_end = max(cur_end, finish)
+    total += cur_end - cur_start
+    return total
+
+
+def _summary(text, offsets, sections):
+    spans = sections.get('summary')
+    if not spans:
+        return None
+    start, end = spans[0]
+    if start >= len(offsets):
+        return None
+    raw = text[offsets[start]:offsets[min(end, len(offsets)) - 1] + 1]
+    raw = " ".join(raw.split())
+    sentences = re.split(r"(?<=[.!?])\s+", raw)
+    summary = " ".join(sentences[:5]).strip()
+    return summary if len(summary) >= 40 else None
+
+
+def extract_local(cv_text):
+    """Retourne (analyse au format parse_analysis, confiance)."""
+    folded, offsets = _fold_with_offsets(cv_text)
+    sections = _sections(folded)
+    skill_ranges = sections.get('skills', [])
+
+    occurrences = _find_skills(folded, offsets, cv_text, skill_ranges)
+    counts = Counter(c for _, c, _ in occurrences)
+    labels = {}
+    in_section = set()
+    for start, canonical, label in occurrences:
+        labels.setdefault(canonical, label)
+        if any(a <= start < b for a, b in skill_ranges):
+            in_section.add(canonical)
+    ranked = sorted(counts, key=lambda c: (c not in in_section, -counts[c]))
+    skills = [labels[c] for c in ranked[:MAX_SKILLS]]
+
+    years = _years_of_experience(folded, sections)
+    summary = _summary(cv_text, offsets, sections)
+
+    if years is not None:
+        domain = ", ".join(skills[:2]) if skills else "son domaine"
+        experience = f"{years} années d'expérience dans le domaine {domain}."
+    else:
+        experience = "Non précisé"
+
+    # Sans résumé la confiance plafonne à 0.65 : sous le seuil par défaut
+    # (0.8), un CV sans résumé passe toujours par Gemini
+    confidence = 0.4 * min(1.0, len(skills) / 5)
+    confidence += 0.1 if skill_ranges else 0
+    confidence += 0.15 if years is not None else 0
+    confidence += 0.35 if summary else 0
+
+    return {
+        "skills": skills if skills else ["Aucune détectée"],
+        "experience": experience,
+        "summary": summary or "Résumé non trouvé"
+    }, round(confidence, 3)
@@ -0,0 +1,84 @@
+import threading
+from bisect import bisect_left
+
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2000, 5000, 10000, 30000)
+RETRY_BUCKETS = (0, 1, 2)
+
+
+class Histogram:
+    """Histogramme à seuils fixes (cumul par seuil 'le', comme Prometheus)."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # dernier = +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = value if self.max is None else max(self.max, value)
+
+    def snapshot(self):
+        cumulative, buckets = 0, {}
+        for bound, n in zip(list(self.buckets) + ['+Inf'], self.counts):
+            cumulative += n
+            buckets[str(bound)] = cumulative
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 3),
+            'avg': round(self.sum / self.count, 3) if self.count else None,
+            'max': self.max,
+            'buckets': buckets
+        }
+
+
+class ModelMetrics:
+    """Tokens, latence et retries des appels au modèle, par endpoint."""
+
+    HISTOGRAMS = {
+        'prompt_tokens': TOKEN_BUCKETS,
+        'output_tokens': TOKEN_BUCKETS,
+        'latency_ms': LATENCY_BUCKETS_MS,
+        'retries': RETRY_BUCKETS,
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def _endpoint(self, name):
+        stats = self._endpoints.get(name)
+        if stats is None:
+            stats = {
+                'calls': 0,
+                'errors': 0,
+                'histograms': {metric: Histogram(b) for metric, b in self.HISTOGRAMS.items()}
+            }
+            self._endpoints[name] = stats
+        return stats
+
+    def record(self, endpoint, prompt_tokens, output_tokens, latency_ms, retries, error=False):
+        with self._lock:
+            stats = self._endpoint(endpoint)
+            stats['calls'] += 1
+            stats['errors'] += int(error)
+            hist = stats['histograms']
+            hist['prompt_tokens'].observe(prompt_tokens)
+            hist['output_tokens'].observe(output_tokens)
+            hist['latency_ms'].observe(latency_ms)
+            hist['retries'].observe(retries)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: {
+                    'calls': stats['calls'],
+                    'errors': stats['errors'],
+                    **{metric: h.snapshot() for metric, h in stats['histograms'].items()}
+                }
+                for name, stats in self._endpoints.items()
+            }
@@ -0,0 +1,330 @@
+import atexit
+import io
+import itertools
+import math
+import multiprocessing
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+from common.bootstrap import pdf_module
+
+MAX_PAGES = int(os.getenv("AI_PDF_MAX_PAGES", "15"))
+PAGE_TIMEOUT = float(os.getenv("AI_PDF_PAGE_TIMEOUT", "5"))
+WORKERS = int(os.getenv("AI_PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Budget du texte envoyé au modèle (~4 caractères par token)
+PROMPT_TOKEN_BUDGET = int(os.getenv("AI_PROMPT_TOKEN_BUDGET", "4000"))
+CHARS_PER_TOKEN = 4
+
+# Lignes d'en-tête / pied de page examinées en haut et en bas de chaque page
+EDGE_LINES = 2
+
+
+# --- Côté worker ---
+# Le PDF arrive en octets et est relu depuis un BytesIO : rien n'est écrit
+# sur disque, quelle que soit la taille du document.
+def _page_text(reader, index):
+    try:
+        return reader.pages[index].extract_text() or ''
+    except Exception as e:
+        print(f"Erreur PDF page {index}: {e}")
+        return ''
+
+def _page_count(data):
+    return len(pdf_module().PdfReader(io.BytesIO(data)).pages)
+
+def _extract_pages(data, indices):
+    reader = pdf_module().PdfReader(io.BytesIO(data))
+    return [_page_text(reader, i) for i in indices]
+
+
+# --- Nettoyage ---
+def _normalize_line(line):
+    return " ".join(line.split())
+
+def _edge_key(line):
+    # Les numéros de page varient d'une page à l'autre : "Page 2 / 3" == "Page 3 / 3"
+    return re.sub(r"\d+", "#", line.lower())
+
+def clean_pages(pages):
+    """Supprime les en-têtes / pieds de page répétés et compacte les espaces."""
+    pages = [[l for l in (_normalize_line(x) for x in p.splitlines()) if l] for p in pages]
+
+    repeated = set()
+    if len(pages) >= 2:
+        edges = Counter()
+        for lines in pages:
+            edges.update({_edge_key(l) for l in lines[:EDGE_LINES] + lines[-EDGE_LINES:]})
+        repeated = {key for key, n in edges.items() if n >= max(2, len(pages) / 2)}
+
+    cleaned = []
+    for lines in pages:
+        kept = [l for i, l in enumerate(lines)
+                if not ((i < EDGE_LINES or i >= len(lines) - EDGE_LINES) and _edge_key(l) in repeated)]
+        if kept:
+            cleaned.append("\n".join(kept))
+    return "\n\n".join(cleaned).strip()
+
+def truncate_to_budget(text, max_tokens=PROMPT_TOKEN_BUDGET):
+    """Coupe le texte au budget de tokens, sur une fin de ligne si possible."""
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text.rfind("\n", 0, limit)
+    return text[:cut if cut > limit // 2 else limit].rstrip()
+
+
+# --- Processus hôte du pool ---
+class _PoolHost:
+    """Côté hôte : un thread par PDF en cours, tous sur le même pool.
+
+    Un pool dont un paquet a dépassé son délai est retiré : les PDF
+    suivants ont un pool neuf, et il est arrêté quand les extractions qui
+    l'utilisent encore sont terminées. Les délais tiennent compte des pages
+    déjà en file (backlog), les PDF concurrents se partageant les workers.
+    """
+
+    def __init__(self, workers, max_pages, page_timeout):
+        self.workers = workers
+        self.max_pages = max_pages
+        self.page_timeout = page_timeout
+        self.context = multiprocessing.get_context('fork')
+        self.lock = threading.Lock()
+        self.pool = None
+        self.users = {}        # pool -> extractions en cours
+        self.backlog = 0       # pages soumises et non terminées
+
+    def _acquire(self):
+        with self.lock:
+            if self.pool is None:
+                self.pool = self.context.Pool(self.workers)
+                self.users[self.pool] = 0
+            self.users[self.pool] += 1
+            return self.pool
+
+    def _release(self, pool, timed_out):
+        with self.lock:
+            self.users[pool] -= 1
+            if timed_out and pool is self.pool:
+                self.pool = None
+            retired = pool is not self.pool and self.users[pool] == 0
+            if retired:
+                del self.users[pool]
+        if retired:
+            # Libère les workers bloqués
+            pool.terminate()
+
+    def _reserve(self, pages):
+        """Ajoute `pages` au backlog ; retourne le délai pour les traiter (s)."""
+        with self.lock:
+            self.backlog += pages
+            return self.page_timeout * max(1, math.ceil(self.backlog / self.workers))
+
+    def extract(self, data):
+        """(pages, nombre total de pages, délais dépassés)."""
+        pool = self._acquire()
+        timeouts = 0
+        try:
+            wait = self._reserve(1)
+            try:
+                total = pool.apply_async(_page_count, (data,)).get(wait)
+            except multiprocessing.TimeoutError:
+                timeouts = 1
+                return [], 0, timeouts
+            finally:
+                self._reserve(-1)
+            count = min(total, self.max_pages)
+
+            # Un paquet de pages par worker : le PDF n'est copié qu'une fois par paquet
+            groups = [list(range(w, count, self.workers)) for w in range(min(self.workers, count))]
+            deadline = time.monotonic() + self._reserve(count)
+            try:
+                results = [pool.apply_async(_extract_pages, (data, group)) for group in groups]
+                pages = [''] * count
+                for group, result in zip(groups, results):
+                    try:
+                        texts = result.get(max(0.0, deadline - time.monotonic()))
+                    except multiprocessing.TimeoutError:
+                        print(f"Pages {group} ignorées (délai de {self.page_timeout}s par page dépassé)")
+                        timeouts += 1
+                        continue
+                    for index, text in zip(group, texts):
+                        pages[index] = text
+            finally:
+                self._reserve(-count)
+            return pages, total, timeouts
+        except Exception as e:
+            print("Erreur PDF:", e)
+            return [], 0, timeouts
+        finally:
+            self._release(pool, timeouts)
+
+    def close(self):
+        with self.lock:
+            pools, self.users, self.pool = list(self.users), {}, None
+        for pool in pools:
+            pool.terminate()
+
+
+def _host(conn, workers, max_pages, page_timeout):
+    """Reçoit les PDF (id, octets) et renvoie (id, résultat) dès qu'il est prêt.
+
+    Forké au chargement du module, avant les threads Firebase / gRPC : les
+    recréations de pool forkent ce processus, jamais le service. Chaque PDF
+    est extrait dans son propre thread ; les réponses peuvent donc revenir
+    dans un autre ordre que les demandes.
+    """
+    host = _PoolHost(workers, max_pages, page_timeout)
+    send_lock = threading.Lock()
+
+    def serve(request_id, data):
+        result = host.extract(data)
+        with send_lock:
+            try:
+                conn.send((request_id, result))
+            except OSError:
+                pass
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+        threading.Thread(target=serve, args=message, daemon=True).start()
+    host.close()
+
+
+class PdfTextExtractor:
+    """Extraction du texte des pages en parallèle dans un pool de processus.
+
+    Au plus MAX_PAGES pages sont lues, réparties en un paquet par worker.
+    Le pool appartient à un processus hôte forké au chargement du module :
+    un paquet qui dépasse son délai est ignoré et c'est l'hôte qui recrée
+    le pool. Le PDF est transmis en octets, sans fichier temporaire.
+    Plusieurs PDF (threads de requête, workers batch) sont extraits en même
+    temps : chaque demande porte un id et un thread lecteur remet chaque
+    réponse à son appelant. Sans 'fork' (Windows), si l'hôte s'arrête ou ne
+    répond plus dans le délai, l'extraction se fait en série dans le thread
+    appelant.
+    """
+
+    def __init__(self, workers=WORKERS, max_pages=MAX_PAGES, page_timeout=PAGE_TIMEOUT):
+        self.workers = workers if 'fork' in multiprocessing.get_all_start_methods() else 0
+        self.max_pages = max_pages
+        self.page_timeout = page_timeout
+        self._state_lock = threading.Lock()   # _conn, _waiting
+        self._send_lock = threading.Lock()
+        self._conn = None
+        self._waiting = {}                    # id -> [Event, résultat]
+        self._ids = itertools.count()
+        self.timeouts = 0
+        self.truncated_pages = 0
+        if self.workers:
+            context = multiprocessing.get_context('fork')
+            self._conn, child = context.Pipe()
+            self._host = context.Process(target=_host, name='pdf-pool-host',
+                                         args=(child, self.workers, max_pages, page_timeout))
+            self._host.start()
+            child.close()
+            threading.Thread(target=self._read_responses, args=(self._conn,),
+                             name='pdf-pool-reader', daemon=True).start()
+            atexit.register(self.close)
+
+    def _read_responses(self, conn):
+        """Remet chaque réponse de l'hôte à la demande qui l'attend."""
+        while True:
+            try:
+                request_id, result = conn.recv()
+            except (EOFError, OSError):
+                break
+            with self._state_lock:
+                slot = self._waiting.pop(request_id, None)
+            if slot is not None:
+                slot[1] = result
+                slot[0].set()
+        # Hôte arrêté : les demandes en attente repassent en série
+        with self._state_lock:
+            self._conn = None
+            waiting, self._waiting = self._waiting, {}
+        for slot in waiting.values():
+            slot[0].set()
+        conn.close()
+
+    def close(self):
+        with self._state_lock:
+            conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        try:
+            with self._send_lock:
+                conn.send(None)
+        except OSError:
+            pass
+        self._host.join(5)
+
+    def extract(self, pdf_file):
+        """Texte nettoyé du PDF, ou "" en cas d'échec."""
+        pdf_file.seek(0)
+        try:
+            if self._conn is not None:
+                text = self._extract_parallel(pdf_file.read())
+                if text is not None:
+                    return text
+                pdf_file.seek(0)
+            return self._extract_serial(pdf_file)
+        except Exception as e:
+            print("Erreur PDF:", e)
+            return ""
+
+    def _limit(self, total):
+        if total > self.max_pages:
+            self.truncated_pages += total - self.max_pages
+        return min(total, self.max_pages)
+
+    def _extract_serial(self, pdf_file):
+        reader = pdf_module().PdfReader(pdf_file)
+        return clean_pages([_page_text(reader, i) for i in range(self._limit(len(reader.pages)))])
+
+    def _extract_parallel(self, data):
+        """Texte via le processus hôte ; None si l'hôte ne répond plus."""
+        with self._state_lock:
+            conn = self._conn
+            if conn is None:
+                return None
+            request_id = next(self._ids)
+            slot = self._waiting[request_id] = [threading.Event(), None]
+            in_flight = len(self._waiting)
+        # Les PDF en cours se partagent les workers de l'hôte
+        wait = self.page_timeout * (2 + math.ceil(self.max_pages * in_flight / self.workers))
+        try:
+            if not self._send_lock.acquire(timeout=wait):
+                raise TimeoutError("envoi bloqué")
+            try:
+                conn.send((request_id, data))
+            finally:
+                self._send_lock.release()
+            if not slot[0].wait(wait):
+                raise TimeoutError("pas de réponse")
+        except (OSError, TimeoutError) as e:
+            print(f"Hôte du pool PDF indisponible ({e}), extraction en série")
+            with self._state_lock:
+                self._waiting.pop(request_id, None)
+                self._conn = None
+            # Le thread lecteur voit la fin du pipe et libère les autres demandes
+            self._host.kill()
+            return None
+        if slot[1] is None:
+            return None
+        pages, total, timeouts = slot[1]
+        self._limit(total)
+        self.timeouts += timeouts
+        return clean_pages(pages)
+
+    def stats(self):
+        return {'workers': self.workers if self._conn is not None else 0, 'max_pages': self.max_pages,
+                'page_timeout': self.page_timeout, 'timeouts': self.timeouts,
+                'pages_skipped': self.truncated_pages}
@@ -0,0 +1,31 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """Limiteur de débit à jetons, partagé par tous les appels au modèle.
+
+    `rate` jetons sont ajoutés par seconde, jusqu'à `capacity` ; acquire()
+    bloque tant qu'aucun jeton n'est disponible.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def acquire(self, tokens=1):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                delay = (tokens - self._tokens) / self.rate
+                self.waited += delay
+            time.sleep(delay)
@@ -0,0 +1,131 @@
+import os
+import re
+import sqlite3
+import time
+
+SEARCH_PATH = os.getenv("AI_SEARCH_PATH", os.path.join(os.getcwd(), 'search_index.sqlite3'))
+MAX_RESULTS = 100
+
+# Poids BM25 par colonne : cv_id (non indexé), skills, summary, experience, body
+BM25_WEIGHTS = (0.0, 4.0, 2.0, 1.5, 1.0)
+
+_QUERY_TOKEN = re.compile(r'"[^"]*"|\(|\)|[^\s()"]+')
+_OPERATORS = {'AND', 'OR', 'NOT'}
+
+
+def to_fts_query(query):
+    """Requête utilisateur -> syntaxe FTS5.
+
+    AND / OR / NOT, parenthèses, "phrases" et préfixes (kube*) sont gardés ;
+    les autres termes sont mis entre guillemets pour que c++, node.js ou
+    5-ans ne soient pas lus comme des opérateurs.
+    """
+    parts = []
+    for token in _QUERY_TOKEN.findall(query):
+        if token in _OPERATORS or token in '()':
+            parts.append(token)
+        elif token.startswith('"'):
+            if token.strip('"').strip():
+                parts.append(token)
+        else:
+            prefix = token.endswith('*') and len(token) > 1
+            term = token.rstrip('*').replace('"', '')
+            if term:
+                parts.append(f'"{term}"' + ('*' if prefix else ''))
+    # Un opérateur en début / fin de requête est une erreur de syntaxe FTS5
+    while parts and parts[0] in _OPERATORS | {')'}:
+        parts.pop(0)
+    while parts and parts[-1] in _OPERATORS | {'('}:
+        parts.pop()
+    return " ".join(parts)
+
+
+class SearchIndex:
+    """Index plein texte (SQLite FTS5, classement BM25) des CV analysés.
+
+    Une ligne par CV : compétences, résumé, expérience et texte extrait.
+    `add` remplace la ligne existante, `remove` la supprime ; la table
+    `docs` relie cv_id au rowid FTS pour que ces deux opérations passent
+    par une clé et non par un parcours de la table.
+    """
+
+    def __init__(self, path=SEARCH_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS cv_search USING fts5(
+                    cv_id UNINDEXED, skills, summary, experience, body,
+                    tokenize = 'unicode61 remove_diacritics 2'
+                );
+                CREATE TABLE IF NOT EXISTS docs (
+                    cv_id TEXT PRIMARY KEY,
+                    doc_rowid INTEGER NOT NULL,
+                    pdf_hash TEXT,
+                    updated_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS docs_pdf_hash ON docs (pdf_hash);
+            """)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def add(self, cv_id, parsed, text=None, pdf_hash=None):
+        """Indexe (ou réindexe) un CV. Sans texte, celui d'un PDF identique déjà indexé est repris."""
+        skills = " ; ".join(s for s in parsed.get("skills", []) if s != "Aucune détectée")
+        with self._connect() as conn:
+            if text is None and pdf_hash:
+                row = conn.execute("SELECT s.body FROM docs d JOIN cv_search s ON s.rowid = d.doc_rowid "
+                                   "WHERE d.pdf_hash = ? LIMIT 1", (pdf_hash,)).fetchone()
+                text = row[0] if row else None
+            self._delete(conn, cv_id)
+            cursor = conn.execute(
+                "INSERT INTO cv_search (cv_id, skills, summary, experience, body) VALUES (?, ?, ?, ?, ?)",
+                (cv_id, skills, parsed.get("summary", ""), parsed.get("experience", ""), text or "")
+            )
+            conn.execute("INSERT INTO docs (cv_id, doc_rowid, pdf_hash, updated_at) VALUES (?, ?, ?, ?)",
+                         (cv_id, cursor.lastrowid, pdf_hash, time.time()))
+
+    def remove(self, cv_id):
+        with self._connect() as conn:
+            return self._delete(conn, cv_id)
+
+    @staticmethod
+    def _delete(conn, cv_id):
+        row = conn.execute("SELECT doc_rowid FROM docs WHERE cv_id = ?", (cv_id,)).fetchone()
+        if row is None:
+            return False
+        conn.execute("DELETE FROM cv_search WHERE rowid = ?", (row[0],))
+        conn.execute("DELETE FROM docs WHERE cv_id = ?", (cv_id,))
+        return True
+
+    def search(self, query, limit=20, offset=0):
+        """Retourne (résultats, il reste des résultats) ; lève ValueError si la requête est invalide."""
+        fts_query = to_fts_query(query)
+        if not fts_query:
+            raise ValueError("Requête vide")
+        limit = max(1, min(limit, MAX_RESULTS))
+        weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+        try:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    f"SELECT cv_id, bm25(cv_search, {weights}) AS rank, skills, summary, "
+                    f"snippet(cv_search, 4, '[', ']', '…', 16) "
+                    f"FROM cv_search WHERE cv_search MATCH ? ORDER BY rank LIMIT ? OFFSET ?",
+                    (fts_query, limit + 1, offset)
+                ).fetchall()
+        except sqlite3.OperationalError as e:
+            raise ValueError(f"Requête invalide: {e}")
+        results = [{
+            'cv_id': cv_id,
+            # bm25() est négatif : plus petit = plus pertinent
+            'score': round(-rank, 4),
+            'skills': [s for s in skills.split(" ; ") if s],
+            'summary': summary,
+            'snippet': snippet
+        } for cv_id, rank, skills, summary, snippet in rows[:limit]]
+        return results, len(rows) > limit
+
+    def stats(self):
+        with self._connect() as conn:
+            return {'documents': conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]}
@@ -1,16 +1,48 @@
+import time
+_import_started = time.perf_counter()
+
 from flask import Flask, request, jsonify
-import firebase_admin
-from firebase_admin import credentials, firestore
 from flask_cors import CORS
+from google.api_core.exceptions import AlreadyExists
+import os
+import sys
 import uuid
 from datetime import datetime
 
-cred = credentials.Certificate("../../firebase/firebase_admin_key.json")
-firebase_admin.initialize_app(cred)
-db = firestore.client()
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from common.bootstrap import Lazy, firestore_client, firestore_module, startup
+from job_cache import TTLCache
+from app_stats import COUNTED_FIELD, ApplicationCounters
+from ranking import cv_id_of, match_scores, rank_key
+from bulk_status import MAX_BULK_IDS, bulk_update_status, read_applications
+from app_logging import count_rows, install_request_summary, setup_logging
+from common.pagination import InvalidCursor, decode_cursor, encode_cursor
+
+# Clients Firestore créés au premier usage
+db = Lazy(firestore_client)
+firestore = Lazy(firestore_module)
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['X-Next-Cursor'])
+
+# Journaux : une ligne de résumé par requête, écrite hors du thread de la requête
+logger = setup_logging()
+install_request_summary(app, logger)
+
+# Offres lues à chaque candidature : gardées quelques secondes en mémoire
+job_cache = TTLCache()
+
+def load_job(job_id):
+    job = db.collection('jobs').document(job_id).get()
+    return job.to_dict() if job.exists else None
+
+# Compteurs par offre / recruteur, mis à jour dans les mêmes écritures que les candidatures
+counters = ApplicationCounters(db)
+
+def application_owners(app_data):
+    """(job_id, recruiter_id) d'une candidature (anciens documents : champs à plat)."""
+    job = app_data.get('job') or {}
+    return job.get('id') or app_data.get('job_id'), job.get('recruiter_id')
 
 # POST: un candidat postule à une offre
 @app.route('/applications', methods=['POST'])
@@ -23,22 +55,20 @@ def apply_to_job():
         if not all(field in data for field in required_fields):
             return jsonify({'error': 'Données manquantes'}), 400
 
-        # Vérifier si le job existe
-        job_ref = db.collection('jobs').document(data['job_id'])
-        job = job_ref.get()
+        # Vérifier si le job existe (cache court)
+        job_data = job_cache.get_or_load(data['job_id'], load_job)
         
-        if not job.exists:
+        if job_data is None:
             return jsonify({'error': 'Job non trouvé'}), 404
-            
-        job_data = job.to_dict()
         
         # Vérification des IDs
         if 'recruiter_id' not in job_data:
             return jsonify({'error': 'Job invalide: aucun recruteur associé'}), 400
 
-        # Création de la candidature avec des champs bien séparés
+        # Création de la candidature avec des champs bien séparés.
+        # ID déterministe : une seconde soumission (double clic) vise le même document
         application = {
-            'id': str(uuid.uuid4()),
+            'id': f"{data['job_id']}_{data['candidate_id']}",
             'job': {  # Sous-objet pour les infos du job
                 'id': data['job_id'],
                 'title': data['job_title'],
@@ -55,11 +85,10 @@ def apply_to_job():
             'summary': data.get('summary', ''), 
             'created_at': datetime.utcnow().isoformat(),
             'status': 'pending',
-            'match_score': data.get('match_score', 0)
+            'match_score': data.get('match_score', 0),
+            COUNTED_FIELD: True
         }
         
-        db.collection('applications').document(application['id']).set(application)
-
         # Création de la notification pour le recruteur
         notification_id = str(uuid.uuid4())
         notification = {
@@ -75,8 +104,19 @@ def apply_to_job():
             'createdAt': datetime.utcnow()
         }
         
-        db.collection('notifications').document(notification_id).set(notification)
-        
+        # Candidature + notification en un seul commit atomique ;
+        # create() échoue si la candidature existe déjà
+        batch = db.batch()
+        batch.create(db.collection('applications').document(application['id']), application)
+        batch.set(db.collection('notifications').document(notification_id), notification)
+        counters.add(batch, data['job_id'], job_data['recruiter_id'], counters.for_new())
+        try:
+            batch.commit()
+        except AlreadyExists:
+            return jsonify({
+                'error': 'Candidature déjà envoyée pour cette offre',
+                'id': application['id']
+            }), 409
 
         return jsonify(application), 201
     except Exception as e:
@@ -111,69 +151,80 @@ def get_candidate_applications(candidate_id):
             }
             applications.append(application)
         
+        count_rows(len(applications))
         return jsonify(applications), 200
         
     except Exception as e:
-        print(f"Error in get_candidate_applications: {str(e)}")
+        logger.exception("Erreur get_candidate_applications %s", candidate_id)
         return jsonify({'error': str(e)}), 500
 
 # GET: récupérer toutes les candidatures pour un job
 @app.route('/applications/job/<job_id>', methods=['GET'])
 def get_job_applications(job_id):
     try:
-        print(f"\n=== RÉCUPÉRATION DES CANDIDATURES POUR LE JOB {job_id} ===")
-        
         # Vérifier si le job existe
-        job_ref = db.collection('jobs').document(job_id)
-        job = job_ref.get()
+        job_data = job_cache.get_or_load(job_id, load_job)
         
-        if not job.exists:
-            print(f"ERREUR: Le job {job_id} n'existe pas")
+        if job_data is None:
+            logger.warning("Job %s inexistant", job_id)
             return jsonify({'error': 'Job non trouvé'}), 404
-            
-        job_data = job.to_dict()
-        print(f"Job trouvé: {job_data}")
         
         # Récupérer toutes les candidatures pour ce job
-        print(f"Recherche des candidatures pour le job {job_id}...")
         applications = db.collection('applications')\
                         .where('job_id', '==', job_id)\
                         .stream()
         
         applications_list = []
+        invalid = 0
         for app in applications:
             app_data = app.to_dict()
-            print(f"Candidature trouvée: {app_data}")
             # Vérifier que toutes les données nécessaires sont présentes
             if all(key in app_data for key in ['id', 'job_id', 'candidate_id', 'candidate_name', 'cv_url', 'status']):
                 applications_list.append(app_data)
             else:
-                print(f"Candidature invalide (données manquantes): {app_data}")
-            
-        print(f"Nombre total de candidatures trouvées pour le job {job_id}: {len(applications_list)}")
-        if applications_list:
-            print("Détail des candidatures:")
-            for app in applications_list:
-                print(f"- ID: {app.get('id')}")
-                print(f"  Candidat: {app.get('candidate_name')}")
-                print(f"  Statut: {app.get('status')}")
-                print(f"  Date: {app.get('created_at')}")
-        else:
-            print(f"Aucune candidature trouvée pour le job {job_id}")
-            
+                invalid += 1
+                logger.debug("Candidature invalide (données manquantes): %s", app.id)
+        
+        if invalid:
+            logger.warning("%d candidature(s) invalide(s) ignorée(s) pour le job %s", invalid, job_id)
+        count_rows(len(applications_list))
         return jsonify(applications_list), 200
     except Exception as e:
-        print(f"Erreur lors de la récupération des candidatures du job: {str(e)}")
+        logger.exception("Erreur lors de la récupération des candidatures du job %s", job_id)
         return jsonify({'error': str(e)}), 500
 
+def change_status(transaction, application_ref, new_status):
+    snapshot = application_ref.get(transaction=transaction)
+    if not snapshot.exists:
+        return None
+    app_data = snapshot.to_dict()
+    transaction.update(application_ref, {
+        'status': new_status,
+        'updated_at': datetime.utcnow().isoformat()
+    })
+    job_id, recruiter_id = application_owners(app_data)
+    if counters.counted(app_data):
+        counters.add(transaction, job_id, recruiter_id,
+                     counters.for_status_change(app_data.get('status'), new_status))
+    return app_data
+
+def remove_application(transaction, application_ref):
+    snapshot = application_ref.get(transaction=transaction)
+    if not snapshot.exists:
+        return None
+    app_data = snapshot.to_dict()
+    transaction.delete(application_ref)
+    job_id, recruiter_id = application_owners(app_data)
+    if counters.counted(app_data):
+        counters.add(transaction, job_id, recruiter_id, counters.for_delete(app_data.get('status')))
+    return app_data
+
 # PUT: mettre à jour le statut d'une candidature
 @app.route('/applications/<application_id>/status', methods=['PUT'])
 def update_application_status(application_id):
     try:
-        print(f"\n=== MISE À JOUR DU STATUT DE LA CANDIDATURE {application_id} ===")
         data = request.get_json()
         new_status = data.get('status')
-        print(f"Nouveau statut: {new_status}")
         
         if not new_status:
             return jsonify({'error': 'Le statut est requis'}), 400
@@ -181,49 +232,85 @@ def update_application_status(application_id):
         if new_status not in ['accepted', 'rejected', 'pending']:
             return jsonify({'error': 'Statut invalide'}), 400
 
-        # Vérifier si la candidature existe
+        # Lecture, mise à jour et compteurs dans une même transaction
         application_ref = db.collection('applications').document(application_id)
-        application = application_ref.get()
+        update = firestore.transactional(change_status)
+        app_data = update(db.transaction(), application_ref, new_status)
         
-        if not application.exists:
-            print(f"Candidature {application_id} non trouvée")
+        if app_data is None:
+            logger.warning("Candidature %s non trouvée", application_id)
             return jsonify({'error': 'Candidature non trouvée'}), 404
         
-        # Mettre à jour le statut
-        application_ref.update({
-            'status': new_status,
-            'updated_at': datetime.utcnow().isoformat()
-        })
-        
-        print(f"Statut mis à jour avec succès pour la candidature {application_id}")
+        logger.debug("Candidature %s: %s -> %s", application_id, app_data.get('status'), new_status)
         return jsonify({
             'message': 'Statut mis à jour avec succès',
             'status': new_status
         }), 200
         
     except Exception as e:
-        print(f"Erreur lors de la mise à jour du statut: {str(e)}")
+        logger.exception("Erreur lors de la mise à jour du statut de %s", application_id)
+        return jsonify({'error': str(e)}), 500
+
+# PUT: changer le statut de plusieurs candidatures en une requête
+#   {"status": "rejected", "ids": ["...", ...]}
+#   {"status": "rejected", "filter": {"job_id": "...", "status": "pending"}}
+# Lectures par lots, écritures par commits de 500 (candidature + notification
+# du candidat + compteurs) ; résultat par id : updated, unchanged, not_found, error.
+@app.route('/applications/status/bulk', methods=['PUT'])
+def bulk_update_application_status():
+    try:
+        data = request.get_json(silent=True) or {}
+        new_status = data.get('status')
+        if new_status not in ['accepted', 'rejected', 'pending']:
+            return jsonify({'error': 'Statut invalide'}), 400
+
+        ids, filters = data.get('ids'), data.get('filter')
+        if ids is not None:
+            if not isinstance(ids, list) or not all(isinstance(i, str) and i for i in ids):
+                return jsonify({'error': 'ids doit être une liste d\'identifiants'}), 400
+            ids = list(dict.fromkeys(ids))
+            if len(ids) > MAX_BULK_IDS:
+                return jsonify({'error': f'Maximum {MAX_BULK_IDS} candidatures par requête'}), 400
+            snapshots = read_applications(db, ids)
+        elif isinstance(filters, dict) and (filters.get('job_id') or filters.get('recruiter_id')):
+            query = db.collection('applications')
+            if filters.get('job_id'):
+                query = query.where('job.id', '==', filters['job_id'])
+            if filters.get('recruiter_id'):
+                query = query.where('job.recruiter_id', '==', filters['recruiter_id'])
+            if filters.get('status'):
+                query = query.where('status', '==', filters['status'])
+            snapshots = query.stream()
+        else:
+            return jsonify({'error': 'ids ou filter (job_id / recruiter_id) requis'}), 400
+
+        results, commits = bulk_update_status(db, counters, application_owners, snapshots, new_status,
+                                              ids=ids)
+        summary = {}
+        for row in results:
+            summary[row['result']] = summary.get(row['result'], 0) + 1
+        count_rows(len(results))
+        logger.info("Statut '%s' appliqué en masse: %s (%d commit(s))", new_status, summary, commits)
+        return jsonify({'status': new_status, 'summary': summary, 'results': results}), 200
+    except Exception as e:
+        logger.exception("Erreur lors de la mise à jour groupée des statuts")
         return jsonify({'error': str(e)}), 500
 
 # DELETE: supprimer une candidature
 @app.route('/applications/<application_id>', methods=['DELETE'])
 def delete_application(application_id):
     try:
-        print(f"\n=== SUPPRESSION DE LA CANDIDATURE {application_id} ===")
-        # Vérifier si la candidature existe
+        # Suppression et compteurs dans une même transaction
         application_ref = db.collection('applications').document(application_id)
-        application = application_ref.get()
+        delete = firestore.transactional(remove_application)
         
-        if not application.exists:
-            print(f"Candidature {application_id} non trouvée")
+        if delete(db.transaction(), application_ref) is None:
+            logger.warning("Candidature %s non trouvée", application_id)
             return jsonify({'error': 'Candidature non trouvée'}), 404
         
-        # Supprimer la candidature
-        application_ref.delete()
-        print(f"Candidature {application_id} supprimée avec succès")
         return jsonify({'message': 'Candidature supprimée avec succès'}), 200
     except Exception as e:
-        print(f"Erreur lors de la suppression: {str(e)}")
+        logger.exception("Erreur lors de la suppression de %s", application_id)
         return jsonify({'error': str(e)}), 500
 
 # GET: récupérer toutes les candidatures pour un recruteur
@@ -240,12 +327,98 @@ def get_recruiter_applications(recruiter_id):
             # Compléter les données si nécessaire
             app_data['id'] = app.id
             applications_list.append(app_data)
-            
+        
+        count_rows(len(applications_list))
         return jsonify(applications_list), 200
     except Exception as e:
-        print(f"Error: {str(e)}")
+        logger.exception("Erreur get_recruiter_applications %s", recruiter_id)
+        return jsonify({'error': str(e)}), 500
+
+# GET: candidatures classées par score de matching, paginées
+#   /applications/job/<job_id>/ranked?limit=20&cursor=...
+#   /applications/recruiter/<recruiter_id>/ranked?limit=20&cursor=...
+DEFAULT_RANKED_PAGE = 20
+
+def ranked_response(query):
+    limit = request.args.get('limit', default=DEFAULT_RANKED_PAGE, type=int)
+    limit = max(1, min(limit, 500))
+    try:
+        cursor = decode_cursor(request.args.get('cursor'))
+        if cursor is not None and not (isinstance(cursor, dict) and {'s', 'id'} <= cursor.keys()):
+            raise InvalidCursor("Cursor invalide")
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+
+    applications = []
+    for doc in query.stream():
+        app_data = doc.to_dict()
+        app_data['id'] = doc.id
+        applications.append(app_data)
+
+    # Scores : match_results en lots, puis un appel groupé pour les manquants
+    pairs = {}
+    for app_data in applications:
+        cv_id, (job_id, _) = cv_id_of(app_data), application_owners(app_data)
+        if cv_id and job_id:
+            pairs[app_data['id']] = (cv_id, job_id)
+    scores = match_scores(db, pairs.values())
+    for app_data in applications:
+        pair = pairs.get(app_data['id'])
+        app_data['match_score'] = scores.get(pair, app_data.get('match_score') or 0)
+
+    applications.sort(key=rank_key)
+    if cursor is not None:
+        after = (-cursor['s'], cursor['id'])
+        applications = [a for a in applications if rank_key(a) > after]
+    page = applications[:limit]
+    count_rows(len(page))
+
+    headers = {}
+    if len(applications) > limit:
+        last = page[-1]
+        headers['X-Next-Cursor'] = encode_cursor({'s': last['match_score'], 'id': last['id']})
+    return jsonify(page), 200, headers
+
+@app.route('/applications/job/<job_id>/ranked', methods=['GET'])
+def get_ranked_job_applications(job_id):
+    try:
+        return ranked_response(db.collection('applications').where('job.id', '==', job_id))
+    except Exception as e:
+        logger.exception("Erreur classement des candidatures du job %s", job_id)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/applications/recruiter/<recruiter_id>/ranked', methods=['GET'])
+def get_ranked_recruiter_applications(recruiter_id):
+    try:
+        return ranked_response(db.collection('applications').where('job.recruiter_id', '==', recruiter_id))
+    except Exception as e:
+        logger.exception("Erreur classement des candidatures du recruteur %s", recruiter_id)
+        return jsonify({'error': str(e)}), 500
+
+# GET: compteurs d'une offre ou d'un recruteur (une seule requête)
+@app.route('/applications/stats/<scope>/<key>', methods=['GET'])
+def get_application_stats(scope, key):
+    if scope not in ('job', 'recruiter'):
+        return jsonify({'error': 'Portée invalide (job ou recruiter)'}), 400
+    try:
+        return jsonify({scope + '_id': key, **counters.read(scope, key)}), 200
+    except Exception as e:
+        logger.exception("Erreur lecture des compteurs %s_%s", scope, key)
         return jsonify({'error': str(e)}), 500
 
+# POST: le recruteur a consulté ses candidatures, `new` repart de zéro
+@app.route('/applications/stats/<scope>/<key>/seen', methods=['POST'])
+def mark_application_stats_seen(scope, key):
+    if scope not in ('job', 'recruiter'):
+        return jsonify({'error': 'Portée invalide (job ou recruiter)'}), 400
+    try:
+        return jsonify({scope + '_id': key, **counters.mark_seen(scope, key)}), 200
+    except Exception as e:
+        logger.exception("Erreur mise à jour des compteurs %s_%s", scope, key)
+        return jsonify({'error': str(e)}), 500
+
+startup('ApplicationService', _import_started, firestore_client)
+
 if __name__ == '__main__':
-    print("\n=== DÉMARRAGE DU SERVICE DES APPLICATIONS ===")
+    logger.info("Démarrage du service des applications")
     app.run(port=5005, debug=True)
\ No newline at end of file
@@ -0,0 +1,112 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+
+from flask import g, request
+
+LOG_LEVEL = os.getenv("APPLICATION_LOG_LEVEL", "INFO").upper()
+# Part des enregistrements DEBUG conservés (les niveaux >= INFO ne sont jamais échantillonnés)
+LOG_DEBUG_SAMPLE = float(os.getenv("APPLICATION_LOG_DEBUG_SAMPLE", "0.01"))
+LOG_FORMAT = os.getenv("APPLICATION_LOG_FORMAT", "json")     # json ou text
+
+
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par enregistrement ; `extra={'fields': {...}}` ajoute des champs."""
+
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Ne garde qu'une fraction `rate` des enregistrements sous `below`."""
+
+    def __init__(self, rate, below=logging.INFO):
+        super().__init__()
+        self.rate = rate
+        self.below = below
+
+    def filter(self, record):
+        return record.levelno >= self.below or random.random() < self.rate
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler qui dépose l'enregistrement tel quel.
+
+    Le prepare() de la bibliothèque standard formate le message dans le
+    thread appelant et efface exc_info ; ici la copie garde msg, args et
+    exc_info, et c'est le listener qui formate (traceback compris). Les
+    arguments du message ne doivent donc pas être modifiés après l'appel.
+    """
+
+    def prepare(self, record):
+        return copy.copy(record)
+
+
+def setup_logging(name='applications', stream=None):
+    """Logger du service : le thread de la requête ne fait que déposer dans une file.
+
+    Le formatage (JSON) et l'écriture sur stdout sont faits par un
+    QueueListener dans son propre thread, traceback compris ; un
+    enregistrement filtré par le niveau ou l'échantillonnage n'est jamais
+    formaté.
+    """
+    logger = logging.getLogger(name)
+    if logger.handlers:
+        return logger
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+    logger.addFilter(SamplingFilter(LOG_DEBUG_SAMPLE))
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if LOG_FORMAT == 'json'
+                        else logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    logger.addHandler(DeferredQueueHandler(log_queue))
+    return logger
+
+
+def count_rows(n):
+    """Nombre de lignes renvoyées par la requête courante (repris dans le résumé)."""
+    g.log_rows = n
+
+
+def install_request_summary(app, logger):
+    """Un seul enregistrement par requête : route, statut, lignes et durée."""
+
+    @app.before_request
+    def _start_timer():
+        g.log_started = time.perf_counter()
+
+    @app.after_request
+    def _log_summary(response):
+        started = g.pop('log_started', None)
+        if started is not None and logger.isEnabledFor(logging.INFO):
+            logger.info("%s %s", request.method, request.url_rule or request.path, extra={'fields': {
+                'endpoint': request.endpoint,
+                'path': request.path,
+                'status': response.status_code,
+                'rows': g.pop('log_rows', None),
+                'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+            }})
+        return response
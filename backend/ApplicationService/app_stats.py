@@ -0,0 +1,104 @@
+import os
+import random
+
+from common.bootstrap import firestore_module
+
+STATS_SHARDS = int(os.getenv("APPLICATION_STATS_SHARDS", "10"))
+STATUSES = ('pending', 'accepted', 'rejected')
+SEEN_DOC = 'seen'
+# Marque les candidatures comptées dans les shards (créées après les
+# compteurs, ou reprises par backfill_stats.py)
+COUNTED_FIELD = 'counted'
+
+
+class ApplicationCounters:
+    """Compteurs de candidatures par offre et par recruteur, répartis en shards.
+
+    application_stats/{job|recruiter}_{id}/shards/{0..N-1} contient des
+    incréments (total, pending, accepted, rejected, received) ; un shard tiré
+    au hasard par écriture évite la limite d'une écriture/seconde par
+    document. Le document 'seen' de la même sous-collection garde la valeur
+    de `received` à la dernière consultation : les nouvelles candidatures
+    se lisent donc avec une seule requête.
+
+    Seules les candidatures portant COUNTED_FIELD font bouger les
+    compteurs : une candidature antérieure n'y a jamais été ajoutée, la
+    retirer ou changer son statut rendrait les totaux négatifs.
+    """
+
+    def __init__(self, db, collection='application_stats', shards=STATS_SHARDS):
+        self.db = db
+        self.collection = collection
+        self.shards = shards
+
+    def _shards(self, scope, key):
+        return self.db.collection(self.collection).document(f"{scope}_{key}").collection('shards')
+
+    def add(self, writer, job_id, recruiter_id, delta):
+        """Ajoute les incréments `delta` ({champ: n}) au batch ou à la transaction `writer`."""
+        delta = {field: n for field, n in delta.items() if n}
+        if not delta:
+            return
+        increments = {field: firestore_module().Increment(n) for field, n in delta.items()}
+        shard = str(random.randrange(self.shards))
+        for scope, key in (('job', job_id), ('recruiter', recruiter_id)):
+            if key:
+                writer.set(self._shards(scope, key).document(shard), increments, merge=True)
+
+    def add_seen(self, writer, job_id, recruiter_id, n):
+        """Avance le document 'seen' : n candidatures reçues ne compteront pas comme nouvelles."""
+        increment = {'received': firestore_module().Increment(n)}
+        for scope, key in (('job', job_id), ('recruiter', recruiter_id)):
+            if key:
+                writer.set(self._shards(scope, key).document(SEEN_DOC), increment, merge=True)
+
+    @staticmethod
+    def counted(app_data):
+        return bool(app_data.get(COUNTED_FIELD))
+
+    @staticmethod
+    def for_new():
+        return {'total': 1, 'pending': 1, 'received': 1}
+
+    @staticmethod
+    def for_status_change(old_status, new_status):
+        if old_status == new_status:
+            return {}
+        delta = {}
+        if old_status in STATUSES:
+            delta[old_status] = -1
+        if new_status in STATUSES:
+            delta[new_status] = delta.get(new_status, 0) + 1
+        return delta
+
+    @staticmethod
+    def for_delete(status):
+        delta = {'total': -1}
+        if status in STATUSES:
+            delta[status] = -1
+        return delta
+
+    def _sum(self, scope, key):
+        totals = {field: 0 for field in ('total',) + STATUSES + ('received',)}
+        seen = 0
+        for doc in self._shards(scope, key).stream():
+            data = doc.to_dict() or {}
+            if doc.id == SEEN_DOC:
+                seen = data.get('received', 0)
+                continue
+            for field in totals:
+                totals[field] += data.get(field, 0)
+        return totals, seen
+
+    def read(self, scope, key):
+        """Somme des shards (une requête) ; `new` = reçues depuis la dernière consultation."""
+        totals, seen = self._sum(scope, key)
+        received = totals.pop('received')
+        totals['new'] = max(0, received - seen)
+        return totals
+
+    def mark_seen(self, scope, key):
+        totals, _ = self._sum(scope, key)
+        self._shards(scope, key).document(SEEN_DOC).set({'received': totals.pop('received')})
+        totals['new'] = 0
+        return totals
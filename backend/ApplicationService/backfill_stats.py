@@ -0,0 +1,87 @@
+"""Ajoute aux compteurs application_stats les candidatures antérieures.
+
+À lancer une fois depuis backend/ApplicationService après le déploiement
+des compteurs (relançable : les candidatures déjà comptées sont ignorées) :
+
+    python backfill_stats.py
+
+Chaque candidature sans le champ `counted` est ajoutée aux shards de son
+offre et de son recruteur (total, statut) et marquée, dans le même batch.
+Le document `seen` est avancé d'autant : les anciennes candidatures ne
+remontent pas comme nouvelles. Chaque écriture est conditionnée à la date
+de mise à jour lue ; si une candidature a changé entre-temps, le paquet
+est relu et recommencé.
+"""
+import argparse
+import os
+import sys
+
+from google.api_core.exceptions import FailedPrecondition
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from common.bootstrap import firestore_client
+from app_stats import COUNTED_FIELD, STATUSES, ApplicationCounters
+
+# 1 écriture par candidature + 2 shards + 2 documents seen par couple (offre, recruteur)
+CHUNK = 100
+MAX_ATTEMPTS = 5
+
+
+def owners(app_data):
+    job = app_data.get('job') or {}
+    return job.get('id') or app_data.get('job_id'), job.get('recruiter_id')
+
+
+def backfill_chunk(db, counters, refs):
+    """Compte les candidatures `refs` non encore comptées ; retourne leur nombre."""
+    for attempt in range(MAX_ATTEMPTS):
+        batch, deltas, counted = db.batch(), {}, 0
+        for snapshot in db.get_all(refs):
+            if not snapshot.exists:
+                continue
+            app_data = snapshot.to_dict()
+            if counters.counted(app_data):
+                continue
+            batch.update(snapshot.reference, {COUNTED_FIELD: True},
+                         option=db.write_option(last_update_time=snapshot.update_time))
+            delta = deltas.setdefault(owners(app_data), {})
+            fields = ['total', 'received'] + ([app_data['status']] if app_data.get('status') in STATUSES else [])
+            for field in fields:
+                delta[field] = delta.get(field, 0) + 1
+            counted += 1
+        if not counted:
+            return 0
+        for (job_id, recruiter_id), delta in deltas.items():
+            counters.add(batch, job_id, recruiter_id, delta)
+            counters.add_seen(batch, job_id, recruiter_id, delta['received'])
+        try:
+            batch.commit()
+            return counted
+        except FailedPrecondition:
+            print(f"Candidatures modifiées pendant le backfill, nouvel essai ({attempt + 1})")
+    raise RuntimeError(f"Paquet abandonné après {MAX_ATTEMPTS} essais")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compte les candidatures antérieures aux compteurs")
+    parser.add_argument('--chunk', type=int, default=CHUNK, help="candidatures par batch")
+    args = parser.parse_args()
+
+    db = firestore_client()
+    counters = ApplicationCounters(db)
+    total, refs = 0, []
+    for doc in db.collection('applications').select([COUNTED_FIELD]).stream():
+        if (doc.to_dict() or {}).get(COUNTED_FIELD):
+            continue
+        refs.append(doc.reference)
+        if len(refs) >= args.chunk:
+            total += backfill_chunk(db, counters, refs)
+            refs = []
+            print(f"{total} candidature(s) comptée(s)")
+    if refs:
+        total += backfill_chunk(db, counters, refs)
+    print(f"Terminé : {total} candidature(s) ajoutée(s) aux compteurs")
+
+
+if __name__ == '__main__':
+    main()
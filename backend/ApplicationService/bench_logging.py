@@ -0,0 +1,117 @@
+"""Benchmark des journaux du service des candidatures sur GET /applications/job/<id>.
+
+Remplace Firestore par des documents en mémoire (N candidatures pour une
+offre) et appelle la route avec le client de test Flask : la latence
+mesurée est celle du service seul (lecture, journalisation, JSON).
+
+Le tableau est écrit sur stderr ; rediriger stdout comme le ferait un
+conteneur pour mesurer le coût réel des écritures de journaux :
+
+    python bench_logging.py --applications 1000 --requests 50 > service.log
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+JOB_ID = 'bench-job'
+
+
+class Snapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+        self.exists = data is not None
+        self.reference = None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class Query:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def where(self, *args, **kwargs):
+        return self
+
+    def stream(self):
+        return (Snapshot(doc_id, data) for doc_id, data in self.docs.items())
+
+
+class Collection(Query):
+    def document(self, doc_id):
+        return Document(self.docs.get(doc_id), doc_id)
+
+
+class Document:
+    def __init__(self, data, doc_id):
+        self.data = data
+        self.doc_id = doc_id
+
+    def get(self, **kwargs):
+        return Snapshot(self.doc_id, self.data)
+
+
+class MemoryDB:
+    """Le strict nécessaire de l'API Firestore utilisé par les routes de lecture."""
+
+    def __init__(self, applications):
+        self.collections = {
+            'jobs': {JOB_ID: {'title': 'Développeur Python', 'recruiter_id': 'bench-recruiter',
+                              'company': 'Bench', 'description': 'x' * 2000}},
+            'applications': applications
+        }
+
+    def collection(self, name):
+        return Collection(self.collections.setdefault(name, {}))
+
+
+def make_applications(count):
+    applications = {}
+    for i in range(count):
+        app_id = f"{JOB_ID}_candidate-{i:05d}"
+        applications[app_id] = {
+            'id': app_id, 'job_id': JOB_ID, 'candidate_id': f"candidate-{i:05d}",
+            'candidate_name': f"Candidat {i}", 'cv_url': f"{i:08d}-0000-4000-8000-000000000000_cv.pdf",
+            'status': 'pending', 'created_at': '2024-01-01T00:00:00',
+            'job': {'id': JOB_ID, 'title': 'Développeur Python', 'recruiter_id': 'bench-recruiter'},
+            'candidate': {'id': f"candidate-{i:05d}", 'name': f"Candidat {i}"},
+            'skills': ['Python', 'Flask', 'SQL', 'Docker'], 'summary': 'Développeur backend. ' * 10,
+            'match_score': i % 100
+        }
+    return applications
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--applications', type=int, default=1000, help="candidatures pour l'offre")
+    parser.add_argument('--requests', type=int, default=50, help="requêtes mesurées")
+    args = parser.parse_args()
+
+    os.environ.setdefault('BOOTSTRAP_WARMUP', '0')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app as application_service
+
+    application_service.db = MemoryDB(make_applications(args.applications))
+    client = application_service.app.test_client()
+    url = f"/applications/job/{JOB_ID}"
+    rows = len(client.get(url).get_json())       # préchauffage (cache de l'offre)
+
+    latencies = []
+    for _ in range(args.requests):
+        started = time.perf_counter()
+        response = client.get(url)
+        latencies.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200
+    sys.stdout.flush()
+    latencies.sort()
+
+    print(f"{args.applications} candidatures, {rows} renvoyées, {args.requests} requêtes", file=sys.stderr)
+    print(f"moyenne {statistics.fmean(latencies):.2f} ms, médiane {statistics.median(latencies):.2f} ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.2f} ms", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
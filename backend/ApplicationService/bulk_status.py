@@ -0,0 +1,136 @@
+import uuid
+from datetime import datetime
+
+BATCH_MAX_WRITES = 500     # limite Firestore par commit
+GET_ALL_CHUNK = 300
+MAX_BULK_IDS = 5000
+
+STATUS_MESSAGES = {
+    'accepted': "Votre candidature pour {title} a été acceptée",
+    'rejected': "Votre candidature pour {title} n'a pas été retenue",
+    'pending': "Votre candidature pour {title} est de nouveau en attente"
+}
+
+
+def status_notification(app_data, application_id, new_status):
+    """Notification du candidat pour un changement de statut (None si candidat inconnu)."""
+    candidate = app_data.get('candidate') or {}
+    candidate_id = candidate.get('id') or app_data.get('candidate_id')
+    if not candidate_id:
+        return None
+    job = app_data.get('job') or {}
+    title = job.get('title') or app_data.get('job_title', '')
+    return {
+        'id': str(uuid.uuid4()),
+        'userId': candidate_id,
+        'type': 'APPLICATION_STATUS',
+        'applicationId': application_id,
+        'jobId': job.get('id') or app_data.get('job_id'),
+        'jobTitle': title,
+        'status': new_status,
+        'message': STATUS_MESSAGES[new_status].format(title=title),
+        'read': False,
+        'createdAt': datetime.utcnow()
+    }
+
+
+def read_applications(db, application_ids):
+    """Snapshots des candidatures demandées, lus par lots (get_all)."""
+    collection = db.collection('applications')
+    for i in range(0, len(application_ids), GET_ALL_CHUNK):
+        refs = [collection.document(app_id) for app_id in application_ids[i:i + GET_ALL_CHUNK]]
+        yield from db.get_all(refs)
+
+
+class StatusBatch:
+    """Regroupe les changements de statut dans des commits d'au plus BATCH_MAX_WRITES écritures.
+
+    Chaque changement écrit la candidature et la notification du candidat ;
+    les deltas de compteurs sont cumulés par (offre, recruteur) et écrits
+    une seule fois par commit. Chaque candidature a sa ligne de résultat
+    dès add() ; les lignes d'un commit passent à 'updated' (ou 'error')
+    quand il se termine.
+    """
+
+    def __init__(self, db, counters, owners):
+        self.db = db
+        self.counters = counters
+        self.owners = owners          # app_data -> (job_id, recruiter_id)
+        self.commits = 0
+        self._reset()
+
+    def _reset(self):
+        self.batch = self.db.batch()
+        self.pending = []             # lignes de résultat du commit en cours (résultat à venir)
+        self.deltas = {}              # (job_id, recruiter_id) -> {champ: n}
+        self.writes = 0
+
+    def _counter_writes(self, deltas):
+        return sum(bool(job_id) + bool(recruiter_id) for job_id, recruiter_id in deltas)
+
+    def add(self, snapshot, new_status, results):
+        if not snapshot.exists:
+            results.append({'id': snapshot.id, 'result': 'not_found'})
+            return
+        app_data = snapshot.to_dict()
+        old_status = app_data.get('status')
+        if old_status == new_status:
+            results.append({'id': snapshot.id, 'result': 'unchanged', 'status': new_status})
+            return
+        notification = status_notification(app_data, snapshot.id, new_status)
+        # Candidature antérieure aux compteurs : aucun delta à appliquer
+        owners = self.owners(app_data) if self.counters.counted(app_data) else None
+        needed = 1 + (notification is not None)
+        if owners is not None and owners not in self.deltas:
+            needed += self._counter_writes([owners])
+        if self.writes + self._counter_writes(self.deltas) + needed > BATCH_MAX_WRITES:
+            self.flush(results)
+
+        self.batch.update(snapshot.reference, {
+            'status': new_status,
+            'updated_at': datetime.utcnow().isoformat()
+        })
+        self.writes += 1
+        if notification is not None:
+            self.batch.set(self.db.collection('notifications').document(notification['id']), notification)
+            self.writes += 1
+        if owners is not None:
+            delta = self.deltas.setdefault(owners, {})
+            for field, n in self.counters.for_status_change(old_status, new_status).items():
+                delta[field] = delta.get(field, 0) + n
+        row = {'id': snapshot.id, 'result': None, 'previous_status': old_status, 'status': new_status}
+        results.append(row)
+        self.pending.append(row)
+
+    def flush(self, results):
+        if not self.pending:
+            return
+        for (job_id, recruiter_id), delta in self.deltas.items():
+            self.counters.add(self.batch, job_id, recruiter_id, delta)
+        try:
+            self.batch.commit()
+            self.commits += 1
+            for row in self.pending:
+                row['result'] = 'updated'
+        except Exception as e:
+            for row in self.pending:
+                row.update(result='error', error=str(e))
+                del row['previous_status'], row['status']
+        self._reset()
+
+
+def bulk_update_status(db, counters, owners, snapshots, new_status, ids=None):
+    """Applique new_status à toutes les candidatures ; retourne (résultats par id, commits).
+
+    Avec `ids`, les résultats suivent l'ordre de la requête (get_all ne le
+    garantit pas) ; sinon celui du parcours.
+    """
+    results = []
+    writer = StatusBatch(db, counters, owners)
+    for snapshot in snapshots:
+        writer.add(snapshot, new_status, results)
+    writer.flush(results)
+    if ids is not None:
+        position = {app_id: i for i, app_id in enumerate(ids)}
+        results.sort(key=lambda row: position.get(row['id'], len(position)))
+    return results, writer.commits
@@ -0,0 +1,50 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+JOB_CACHE_TTL = float(os.getenv("APPLICATION_JOB_CACHE_TTL", "30"))
+JOB_CACHE_SIZE = int(os.getenv("APPLICATION_JOB_CACHE_SIZE", "1024"))
+
+
+class TTLCache:
+    """Cache mémoire à durée de vie courte pour des documents lus souvent.
+
+    Les absences (loader -> None) ne sont pas mises en cache : une offre
+    créée juste après une requête est vue immédiatement.
+    """
+
+    def __init__(self, ttl=JOB_CACHE_TTL, maxsize=JOB_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._items = OrderedDict()   # clé -> (expiration, valeur)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, key, loader):
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[0] > now:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            self.misses += 1
+
+        value = loader(key)
+        if value is not None:
+            with self._lock:
+                self._items[key] = (now + self.ttl, value)
+                self._items.move_to_end(key)
+                while len(self._items) > self.maxsize:
+                    self._items.popitem(last=False)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._items), 'hits': self.hits, 'misses': self.misses, 'ttl': self.ttl}
@@ -0,0 +1,57 @@
+import logging
+import os
+
+import requests
+
+MATCHINGSERVICE_URL = os.getenv("MATCHINGSERVICE_URL", "http://localhost:5004")
+BULK_CHUNK = 1000          # MAX_BULK_PAIRS côté MatchingService
+GET_ALL_CHUNK = 300
+MATCH_TIMEOUT = (3.05, 30)
+
+http_session = requests.Session()
+logger = logging.getLogger('applications.ranking')
+
+
+def cv_id_of(app_data):
+    """cv_url = '<uuid>_<nom>' : l'UUID est l'identifiant du CV analysé."""
+    return (app_data.get('cv_url') or '').split('_')[0] or None
+
+
+def match_scores(db, pairs):
+    """{(cv_id, job_id): score} pour tous les couples.
+
+    Les scores déjà dans match_results sont lus en lots (get_all) ; les
+    manquants sont calculés par un seul appel /match/bulk par tranche de
+    BULK_CHUNK couples, au lieu d'un appel /match par candidature.
+    """
+    pairs = list(dict.fromkeys(pairs))
+    scores = {}
+    collection = db.collection('match_results')
+    for i in range(0, len(pairs), GET_ALL_CHUNK):
+        chunk = pairs[i:i + GET_ALL_CHUNK]
+        refs = [collection.document(f"{cv_id}_{job_id}") for cv_id, job_id in chunk]
+        for snapshot in db.get_all(refs):
+            if snapshot.exists:
+                data = snapshot.to_dict()
+                scores[(data.get('cv_id'), data.get('job_id'))] = data.get('match_score', 0)
+
+    missing = [pair for pair in pairs if pair not in scores]
+    for i in range(0, len(missing), BULK_CHUNK):
+        chunk = missing[i:i + BULK_CHUNK]
+        try:
+            response = http_session.post(
+                f"{MATCHINGSERVICE_URL}/match/bulk",
+                json={'pairs': [{'cv_id': cv_id, 'job_id': job_id} for cv_id, job_id in chunk]},
+                timeout=MATCH_TIMEOUT
+            )
+            response.raise_for_status()
+            for result in response.json().get('results', []):
+                scores[(result['cv_id'], result['job_id'])] = result.get('match_score', 0)
+        except (requests.RequestException, ValueError) as e:
+            logger.warning("Scores de matching indisponibles pour %d candidature(s): %s", len(chunk), e)
+    return scores
+
+
+def rank_key(app_data):
+    """Score décroissant puis id : ordre total, utilisable comme cursor."""
+    return (-app_data['match_score'], app_data['id'])
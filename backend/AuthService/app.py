@@ -1,21 +1,22 @@
+import time
+_import_started = time.perf_counter()
+
 from flask import Flask, request, jsonify
-import firebase_admin
-from firebase_admin import credentials, auth, firestore
 from functools import wraps
 import os
+import sys
 from flask_cors import CORS
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from common.bootstrap import Lazy, firebase_auth, firestore_client, firestore_module, startup
+
 app = Flask(__name__)
 CORS(app) 
 
-# Initialise Firebase
-try:
-    cred = credentials.Certificate(os.path.abspath("../../firebase/firebase_admin_key.json"))
-    firebase_admin.initialize_app(cred)
-    db = firestore.client()
-except Exception as e:
-    print(f"Erreur d'initialisation Firebase : {e}")
-    db = None
+# Firebase : clients créés au premier usage (common.bootstrap)
+db = Lazy(firestore_client)
+auth = Lazy(firebase_auth)
+firestore = Lazy(firestore_module)
 
 # Middleware pour vérifier les tokens
 def verify_token(f):
@@ -114,6 +115,9 @@ def delete_account():
 def protected_route():
     return jsonify({'message': f"Bienvenue {request.user['email']}"})
 
+# Temps d'import et initialisation des clients en arrière-plan
+startup('AuthService', _import_started, firestore_client, firebase_auth)
+
 # Lancer l'application
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
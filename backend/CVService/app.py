@@ -1,16 +1,24 @@
-from flask import Flask, Blueprint, request, jsonify, send_from_directory, send_file
+import time
+_import_started = time.perf_counter()
+
+from flask import Flask, Blueprint, request, jsonify, send_file
 import os
+import sys
 import uuid
+import requests
 from flask_cors import CORS
-import firebase_admin
-from firebase_admin import credentials, firestore
 from datetime import datetime
 from urllib.parse import unquote
+from werkzeug.utils import secure_filename
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from common.bootstrap import Lazy, firestore_client, startup
+from common.pagination import list_params, ndjson_response, project, query_page, wants_ndjson
+from file_index import FileIndex, file_uuid
+from blob_store import BlobStore, FileTooLarge
 
-# Initialiser Firebase une seule fois
-cred = credentials.Certificate("../../firebase/firebase_admin_key.json") 
-firebase_admin.initialize_app(cred)
-db = firestore.client()
+# Client Firestore partagé, créé au premier usage
+db = Lazy(firestore_client)
 
 # Création du blueprint
 cv_bp = Blueprint('cv', __name__)
@@ -19,51 +27,112 @@ UPLOAD_FOLDER = os.path.join(os.getcwd(), 'uploads')
 # S'assurer que le dossier existe
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-# Route pour uploader un CV
-@cv_bp.route('/upload', methods=['POST'])
-def upload_cv():
-    if 'file' not in request.files:
-        return jsonify({'error': 'No file uploaded'}), 400
-
-    file = request.files['file']
-    print(f"Received file: {file.filename}")
-    filename = f"{uuid.uuid4()}_{file.filename}"
-    filepath = os.path.join(UPLOAD_FOLDER, filename)
-    file.save(filepath)
+# AIService : le CV supprimé est aussi retiré de son index de recherche
+AISERVICE_URL = os.getenv("AISERVICE_URL", "http://localhost:5003")
+
+# Index UUID -> fichier ; les fichiers sont rangés sous uploads/ab/cd/
+file_index = FileIndex(UPLOAD_FOLDER)
+# Contenu des PDF, dédupliqué par SHA-256 sous uploads/blobs/
+blob_store = BlobStore(UPLOAD_FOLDER)
+
+def store_cv(original_filename, stream, user_id):
+    """Enregistre le flux dans le stockage par contenu, l'index et Firestore."""
+    filename = f"{uuid.uuid4()}_{original_filename}"
+    tmp_path, sha256, size = blob_store.spool(stream)
+    # Même transaction que delete_cv : le blob ne peut pas être effacé entre
+    # le test d'existence et l'ajout de la référence
+    with file_index.transaction() as conn:
+        blob_path, deduplicated = blob_store.place(tmp_path, sha256)
+        file_index.add(filename, blob_path, sha256=sha256, conn=conn)
+    if deduplicated:
+        print(f"Contenu déjà stocké ({sha256[:12]}), {filename} y fait référence")
 
     #enregistrement dans firestore
     doc_ref = db.collection('cvs').document()
     doc_ref.set({
-        'original_filename': file.filename,
+        'original_filename': original_filename,
         'saved_filename': filename,
         'upload_time': datetime.utcnow().isoformat() + 'Z',
-        'user_id': request.form.get('user_id') 
+        'user_id': user_id,
+        'sha256': sha256,
+        'size': size
     })
 
-    return jsonify({'message': 'Upload successful', 'filename': filename}), 200
+    return jsonify({
+        'message': 'Upload successful',
+        'filename': filename,
+        'sha256': sha256,
+        'deduplicated': deduplicated
+    }), 200
+
+# Route pour uploader un CV
+@cv_bp.route('/upload', methods=['POST'])
+def upload_cv():
+    if 'file' not in request.files:
+        return jsonify({'error': 'No file uploaded'}), 400
+
+    file = request.files['file']
+    print(f"Received file: {file.filename}")
+    try:
+        return store_cv(file.filename, file.stream, request.form.get('user_id'))
+    except FileTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+
+# Upload en flux : le corps de la requête est le PDF lui-même (sans multipart)
+@cv_bp.route('/upload/stream', methods=['POST', 'PUT'])
+def upload_cv_stream():
+    original_filename = request.args.get('filename') or request.headers.get('X-Filename')
+    if not original_filename:
+        return jsonify({'error': 'No filename provided'}), 400
+    if request.content_length and request.content_length > blob_store.max_bytes:
+        return jsonify({'error': f'Fichier trop volumineux (max {blob_store.max_bytes} octets)'}), 413
+
+    print(f"Received stream: {original_filename}")
+    try:
+        return store_cv(secure_filename(original_filename) or 'cv.pdf', request.stream,
+                        request.args.get('user_id'))
+    except FileTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+
+# Envoi d'un CV avec cache HTTP : ETag fort (SHA-256 du contenu), 304 sur
+# If-None-Match, réponses partielles 206 sur Range (gérés par send_file).
+# Le fichier part par wsgi.file_wrapper (sendfile sous gunicorn), ou par
+# X-Sendfile derrière un proxy si CV_USE_X_SENDFILE=1.
+CACHE_MAX_AGE = int(os.getenv("CV_CACHE_MAX_AGE", "3600"))
+
+def serve_cv(filepath, sha256, filename, as_attachment):
+    response = send_file(filepath, mimetype='application/pdf', as_attachment=as_attachment,
+                         download_name=filename, conditional=True, etag=sha256,
+                         max_age=CACHE_MAX_AGE)
+    # Un CV n'est pas une ressource publique : pas de cache partagé
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
 
 # Route pour récupérer un fichier
 @cv_bp.route('/download/<filename>', methods=['GET'])
 def download_cv(filename):
-    try:
-        return send_from_directory(UPLOAD_FOLDER, filename, as_attachment=True)
-    except FileNotFoundError:
+    filepath, filename, sha256 = file_index.by_filename(filename)
+    if filepath is None or not os.path.exists(filepath):
         return jsonify({'error': 'File not found'}), 404
+    return serve_cv(filepath, sha256, filename, as_attachment=True)
 
 #Route pour supprimer un fichier
 @cv_bp.route('/delete/<filename>', methods=['DELETE'])
 def delete_cv(filename):
     try:
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        
-        # Supprimer le fichier du système de fichiers
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        # Retire l'entrée d'index, et le fichier s'il n'est plus référencé
+        file_index.remove(filename)
         
         # Supprimer le document Firestore correspondant
         docs = db.collection('cvs').where('saved_filename', '==', filename).stream()
         for doc in docs:
             doc.reference.delete()
+
+        try:
+            requests.delete(f"{AISERVICE_URL}/search/{file_uuid(filename)}", timeout=2)
+        except requests.RequestException as e:
+            print(f"Index de recherche non mis à jour pour {filename}: {e}")
         
         return jsonify({'message': 'Fichier supprimé avec succès'}), 200
     except Exception as e:
@@ -74,24 +143,12 @@ def delete_cv(filename):
 @cv_bp.route('/view/<uuid_part>', methods=['GET'])
 def view_cv(uuid_part):
     try:
-        # Cherche le fichier qui commence par l'UUID fourni
-        matching_files = [f for f in os.listdir(UPLOAD_FOLDER) 
-                        if f.startswith(uuid_part)]
-        
-        if not matching_files:
-            return jsonify({
-                'error': 'File not found',
-                'debug_info': {
-                    'requested_uuid': uuid_part,
-                    'available_files': os.listdir(UPLOAD_FOLDER)
-                }
-            }), 404
-
-        if len(matching_files) > 1:
-            print(f"Attention : plusieurs fichiers correspondent à l'UUID {uuid_part}")
-
-        filepath = os.path.join(UPLOAD_FOLDER, matching_files[0])
-        return send_file(filepath, mimetype='application/pdf', as_attachment=False)
+        # Recherche dans l'index par UUID (ou préfixe d'UUID)
+        filepath, filename, sha256 = file_index.by_uuid(uuid_part)
+        if filepath is None or not os.path.exists(filepath):
+            return jsonify({'error': 'File not found', 'requested_uuid': uuid_part}), 404
+
+        return serve_cv(filepath, sha256, filename, as_attachment=False)
         
     except Exception as e:
         print(f"Erreur : {str(e)}")
@@ -100,16 +157,21 @@ def view_cv(uuid_part):
 @cv_bp.route('/list', methods=['GET'])
 def list_cvs():
     try:
-        # Récupérer tous les CVs de Firestore
-        docs = db.collection('cvs').stream()
-        cvs = []
-        
-        for doc in docs:
-            cv_data = doc.to_dict()
-            cv_data['id'] = doc.id  # Ajouter l'ID du document
-            cvs.append(cv_data)
-            
-        return jsonify({'cvs': cvs}), 200
+        params = list_params()
+        docs, next_token = query_page(db.collection('cvs'), **params)
+
+        def rows():
+            for doc in docs:
+                cv_data = doc.to_dict()
+                cv_data['id'] = doc.id  # Ajouter l'ID du document
+                yield project(cv_data, params['fields'])
+
+        headers = {'X-Next-Cursor': next_token} if next_token else {}
+        if wants_ndjson():
+            return ndjson_response(rows(), headers)
+        return jsonify({'cvs': list(rows()), 'next_page_token': next_token}), 200, headers
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -132,11 +194,21 @@ CORS(app, resources={
     r"/cv/*": {
         "origins": ["http://localhost:3000"],
         "methods": ["GET", "POST", "PUT", "DELETE"],
-        "allow_headers": ["Content-Type"]
+        "allow_headers": ["Content-Type", "Range", "If-None-Match", "If-Range"],
+        "expose_headers": ["X-Next-Cursor", "ETag", "Content-Range", "Accept-Ranges"]
     }
 })
 
 app.register_blueprint(cv_bp, url_prefix='/cv')
+app.use_x_sendfile = os.getenv("CV_USE_X_SENDFILE") == "1"
+# Corps multipart refusé dès que Content-Length dépasse la limite (marge pour les en-têtes)
+app.config['MAX_CONTENT_LENGTH'] = blob_store.max_bytes + 64 * 1024
+
+@app.errorhandler(413)
+def request_too_large(e):
+    return jsonify({'error': f'Fichier trop volumineux (max {blob_store.max_bytes} octets)'}), 413
+
+startup('CVService', _import_started, firestore_client)
 
 if __name__ == '__main__':
     app.run(debug=True, port=5001)
\ No newline at end of file
@@ -0,0 +1,100 @@
+"""Benchmark du service des fichiers CV : GET complet, revalidation 304 et Range 206.
+
+Lance CVService dans un thread (serveur werkzeug, boucle locale) sur un
+dossier temporaire, y dépose un PDF synthétique puis mesure octets reçus
+et latences pour chaque scénario :
+
+    python bench_serving.py --size-mb 2 --requests 200
+
+Firestore n'est pas utilisé (seules les routes download/view sont appelées).
+"""
+import argparse
+import logging
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+from werkzeug.serving import make_server
+
+RANGE_CHUNK = 64 * 1024
+
+
+def measure(session, url, count, headers=None):
+    latencies, received, statuses = [], 0, set()
+    for _ in range(count):
+        started = time.perf_counter()
+        response = session.get(url, headers=headers or {})
+        received += len(response.content)
+        latencies.append((time.perf_counter() - started) * 1000)
+        statuses.add(response.status_code)
+    latencies.sort()
+    return {
+        'status': ",".join(str(s) for s in sorted(statuses)),
+        'bytes': received,
+        'mean_ms': statistics.fmean(latencies),
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=float, default=2.0, help="taille du PDF synthétique")
+    parser.add_argument('--requests', type=int, default=100, help="requêtes par scénario")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='cv-bench-')
+    os.chdir(workdir)
+    os.environ.setdefault('BOOTSTRAP_WARMUP', '0')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app as cv_service
+
+    # --- PDF synthétique enregistré comme un upload
+    payload = b"%PDF-1.4\n" + os.urandom(int(args.size_mb * 1024 * 1024))
+    filename = "00000000-0000-4000-8000-000000000000_bench.pdf"
+    with tempfile.TemporaryFile() as f:
+        f.write(payload)
+        f.seek(0)
+        sha256, blob_path, _, _ = cv_service.blob_store.save(f)
+    cv_service.file_index.add(filename, blob_path, sha256=sha256)
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, cv_service.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}/cv"
+    session = requests.Session()
+
+    view_url = f"{base}/view/{filename.split('_')[0]}"
+    etag = session.get(view_url).headers.get('ETag')
+    scenarios = [
+        ("GET complet", view_url, None),
+        ("Revalidation (If-None-Match)", view_url, {'If-None-Match': etag}),
+        ("Range 64 Kio (1re page)", view_url, {'Range': f"bytes=0-{RANGE_CHUNK - 1}"}),
+        ("Download complet", f"{base}/download/{filename}", None),
+        ("Download revalidé", f"{base}/download/{filename}", {'If-None-Match': etag}),
+    ]
+
+    print(f"PDF: {len(payload) / 1024 / 1024:.2f} Mio, {args.requests} requêtes par scénario, ETag {etag}\n")
+    print(f"{'scénario':<32}{'statut':>8}{'octets reçus':>16}{'moy. ms':>10}{'p95 ms':>10}")
+    baseline = None
+    for name, url, headers in scenarios:
+        result = measure(session, url, args.requests, headers)
+        print(f"{name:<32}{result['status']:>8}{result['bytes']:>16,}{result['mean_ms']:>10.2f}{result['p95_ms']:>10.2f}")
+        # Chaque scénario est comparé au GET complet de la même route
+        if headers is None:
+            baseline = result
+        else:
+            saved = 1 - result['bytes'] / baseline['bytes']
+            speedup = baseline['mean_ms'] / result['mean_ms'] if result['mean_ms'] else float('inf')
+            print(f"{'':<32}   -> {saved:.1%} d'octets en moins, latence x{speedup:.1f} plus faible")
+
+    server.shutdown()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
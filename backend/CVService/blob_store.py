@@ -0,0 +1,73 @@
+import hashlib
+import os
+import tempfile
+
+MAX_CV_BYTES = int(os.getenv("CV_MAX_BYTES", str(10 * 1024 * 1024)))
+CHUNK_SIZE = 64 * 1024
+
+
+class FileTooLarge(Exception):
+    pass
+
+
+class BlobStore:
+    """Stockage adressé par contenu : root/blobs/ab/cd/<sha256>.
+
+    Le flux est lu par morceaux dans un fichier temporaire (même disque)
+    en calculant le SHA-256 (spool), puis déplacé atomiquement à sa place
+    (place). Un contenu déjà présent n'est pas recopié. L'appelant qui
+    référence le blob appelle place() dans la transaction de l'index, comme
+    l'effacement de la dernière référence.
+    """
+
+    def __init__(self, root, max_bytes=MAX_CV_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.tmp_dir = os.path.join(root, 'tmp')
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    @staticmethod
+    def blob_path(digest):
+        """Chemin relatif (à root) du blob."""
+        return os.path.join('blobs', digest[:2], digest[2:4], digest)
+
+    def save(self, stream):
+        """Retourne (sha256, chemin relatif, taille, déjà présent) ; lève FileTooLarge."""
+        tmp_path, sha256, size = self.spool(stream)
+        relative, existed = self.place(tmp_path, sha256)
+        return sha256, relative, size, existed
+
+    def spool(self, stream):
+        """Copie le flux dans un fichier temporaire ; retourne (chemin, sha256, taille)."""
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                while chunk := stream.read(CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise FileTooLarge(f"Fichier trop volumineux (max {self.max_bytes} octets)")
+                    digest.update(chunk)
+                    tmp.write(chunk)
+            return tmp_path, digest.hexdigest(), size
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def place(self, tmp_path, sha256):
+        """Range le fichier temporaire comme blob ; retourne (chemin relatif, déjà présent)."""
+        relative = self.blob_path(sha256)
+        target = os.path.join(self.root, relative)
+        try:
+            if os.path.exists(target):
+                os.remove(tmp_path)
+                return relative, True
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(tmp_path, target)
+            return relative, False
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
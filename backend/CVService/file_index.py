@@ -0,0 +1,177 @@
+import hashlib
+import os
+import sqlite3
+import time
+from contextlib import contextmanager, nullcontext
+
+INDEX_PATH = os.getenv("CV_INDEX_PATH", os.path.join(os.getcwd(), 'cv_index.sqlite3'))
+
+
+def file_uuid(filename):
+    """'<uuid>_<nom d'origine>' -> '<uuid>'."""
+    return filename.split('_')[0]
+
+
+class FileIndex:
+    """Index persistant (SQLite) UUID -> fichier, sur un stockage réparti.
+
+    Les fichiers sont rangés sous root/ab/cd/<fichier> (4 premiers caractères
+    de l'UUID) pour éviter un dossier plat géant ; l'index donne le chemin
+    sans parcourir le disque. Les fichiers de l'ancien dossier plat sont
+    indexés sur place au démarrage ; migrate_files.py les déplace.
+    """
+
+    def __init__(self, root, path=INDEX_PATH):
+        self.root = root
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS files (
+                    uuid TEXT PRIMARY KEY,
+                    filename TEXT NOT NULL UNIQUE,
+                    path TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )""")
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(files)")}
+            if 'sha256' not in columns:
+                conn.execute("ALTER TABLE files ADD COLUMN sha256 TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS files_path ON files (path)")
+        self.index_flat_files()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    @contextmanager
+    def transaction(self):
+        """Transaction d'écriture (BEGIN IMMEDIATE), exclusive entre processus.
+
+        Pose d'un blob + ajout de sa référence d'un côté, retrait de la
+        dernière référence + effacement du blob de l'autre : les deux se
+        font sous ce verrou, un upload ne peut pas référencer un blob en
+        cours d'effacement.
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def shard_path(self, filename):
+        """Chemin relatif réparti : ab/cd/<fichier>."""
+        key = file_uuid(filename)
+        return os.path.join(key[:2] or '_', key[2:4] or '_', filename)
+
+    def path_for(self, filename):
+        """Chemin absolu où écrire un nouveau fichier (dossiers créés)."""
+        path = os.path.join(self.root, self.shard_path(filename))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def add(self, filename, relative_path=None, sha256=None, conn=None):
+        """Ajoute le fichier à l'index (dans la transaction `conn` si elle est donnée)."""
+        with self._connect() if conn is None else nullcontext(conn) as conn:
+            conn.execute("INSERT OR REPLACE INTO files (uuid, filename, path, created_at, sha256) "
+                         "VALUES (?, ?, ?, ?, ?)",
+                         (file_uuid(filename), filename, relative_path or self.shard_path(filename),
+                          time.time(), sha256))
+
+    def remove(self, filename):
+        """Retire le fichier de l'index ; retourne False s'il est inconnu.
+
+        Le contenu est effacé du disque dans la même transaction si plus
+        aucun CV ne le référence.
+        """
+        with self.transaction() as conn:
+            row = conn.execute("SELECT path FROM files WHERE filename = ?", (filename,)).fetchone()
+            if row is None:
+                return False
+            conn.execute("DELETE FROM files WHERE filename = ?", (filename,))
+            shared = conn.execute("SELECT 1 FROM files WHERE path = ? LIMIT 1", (row[0],)).fetchone()
+            if not shared:
+                try:
+                    os.remove(os.path.join(self.root, row[0]))
+                except FileNotFoundError:
+                    pass
+        return True
+
+    def _entry(self, row):
+        """(chemin absolu, nom, sha256) ; le hash des anciens fichiers est calculé au premier accès."""
+        if row is None:
+            return None, None, None
+        path, filename, sha256 = os.path.join(self.root, row[0]), row[1], row[2]
+        if sha256 is None and os.path.exists(path):
+            digest = hashlib.sha256()
+            with open(path, 'rb') as f:
+                while chunk := f.read(64 * 1024):
+                    digest.update(chunk)
+            sha256 = digest.hexdigest()
+            with self._connect() as conn:
+                conn.execute("UPDATE files SET sha256 = ? WHERE filename = ?", (sha256, filename))
+        return path, filename, sha256
+
+    def by_filename(self, filename):
+        """(chemin absolu, nom, sha256) ou (None, None, None)."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT path, filename, sha256 FROM files WHERE filename = ?",
+                               (filename,)).fetchone()
+        return self._entry(row)
+
+    def by_uuid(self, uuid_part):
+        """Comme by_filename, pour l'UUID (ou un préfixe d'UUID) du fichier."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT path, filename, sha256 FROM files WHERE uuid = ?",
+                               (uuid_part,)).fetchone()
+            if row is None and uuid_part:
+                # Préfixe : parcours de la clé primaire bornée, sans scan de table
+                rows = conn.execute("SELECT path, filename, sha256 FROM files WHERE uuid >= ? AND uuid < ? LIMIT 2",
+                                    (uuid_part, uuid_part + '\uffff')).fetchall()
+                if len(rows) > 1:
+                    print(f"Attention : plusieurs fichiers correspondent à l'UUID {uuid_part}")
+                row = rows[0] if rows else None
+        return self._entry(row)
+
+    def _flat_files(self):
+        if not os.path.isdir(self.root):
+            return []
+        with os.scandir(self.root) as entries:
+            return [e.name for e in entries if e.is_file()]
+
+    def index_flat_files(self):
+        """Indexe sur place les fichiers du dossier plat (aucun déplacement).
+
+        Sans risque si plusieurs workers démarrent en même temps : les
+        fichiers déjà indexés sont ignorés.
+        """
+        flat = self._flat_files()
+        if not flat:
+            return
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany("INSERT OR IGNORE INTO files (uuid, filename, path, created_at) VALUES (?, ?, ?, ?)",
+                             [(file_uuid(name), name, name, now) for name in flat])
+
+    def migrate_flat_files(self):
+        """Range dans l'arborescence répartie les fichiers de l'ancien dossier plat.
+
+        Commande ponctuelle (migrate_files.py) ; un fichier déjà déplacé par
+        un autre processus est ignoré.
+        """
+        moved = 0
+        for filename in self._flat_files():
+            target = self.path_for(filename)
+            try:
+                os.replace(os.path.join(self.root, filename), target)
+            except FileNotFoundError:
+                continue
+            with self._connect() as conn:
+                conn.execute("UPDATE files SET path = ? WHERE filename = ?", (self.shard_path(filename), filename))
+                conn.execute("INSERT OR IGNORE INTO files (uuid, filename, path, created_at) VALUES (?, ?, ?, ?)",
+                             (file_uuid(filename), filename, self.shard_path(filename), time.time()))
+            moved += 1
+        return moved
@@ -0,0 +1,27 @@
+"""Déplace les CV de l'ancien dossier plat uploads/ vers uploads/ab/cd/.
+
+Commande ponctuelle, à lancer depuis backend/CVService, service arrêté ou
+non (un fichier déjà déplacé est ignoré) :
+
+    python migrate_files.py
+
+Sans cette commande, les fichiers plats restent servis depuis leur
+emplacement actuel : le service les indexe sur place au démarrage.
+"""
+import argparse
+import os
+
+from file_index import FileIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Range les CV du dossier plat dans l'arborescence répartie")
+    parser.add_argument('--root', default=os.path.join(os.getcwd(), 'uploads'), help="dossier des CV")
+    args = parser.parse_args()
+
+    moved = FileIndex(args.root).migrate_flat_files()
+    print(f"{moved} CV(s) déplacé(s) dans l'arborescence répartie")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,24 +1,31 @@
+import time
+_import_started = time.perf_counter()
+
 from flask import Flask, request, jsonify
-import firebase_admin
-from firebase_admin import credentials, firestore, auth  # Correction ici
 import uuid
 from flask_cors import CORS
 import logging
 from functools import wraps
-
-# Initialisation Firebase
-cred = credentials.Certificate("../../firebase/firebase_admin_key.json")
-if not firebase_admin._apps:
-    firebase_admin.initialize_app(cred)
-
-db = firestore.client()
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from common.skills import canonicalize_skills
+from common.bootstrap import Lazy, firebase_auth, firestore_client, firestore_module, startup
+from common.pagination import list_params, ndjson_response, project, query_page, wants_ndjson
+
+# Initialisation Firebase : clients créés au premier usage
+db = Lazy(firestore_client)
+auth = Lazy(firebase_auth)
+firestore = Lazy(firestore_module)
 app = Flask(__name__)
 CORS(app, resources={
     r"/*": {
         "origins": ["http://localhost:3000", "http://localhost:5173"],
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
         "allow_headers": ["Content-Type", "Authorization", "X-Requested-With"],
-        "supports_credentials": True
+        "supports_credentials": True,
+        "expose_headers": ["X-Next-Cursor"]
     }
 })
 
@@ -103,6 +110,8 @@ def create_job():
             'company': data['company'],
             'location': data.get('location', ''),
             'skills': data.get('skills', []),
+            # Forme canonique utilisée par MatchingService pour le scoring
+            'skills_canonical': canonicalize_skills(data.get('skills', [])),
             'recruiter_id': uid,
             'created_at': firestore.SERVER_TIMESTAMP
         }
@@ -124,10 +133,20 @@ def create_job():
 @app.route('/jobs', methods=['GET'])
 def get_all_jobs():
     logger.debug("Requête GET reçue sur /jobs")
-    jobs = db.collection('jobs').stream()
-    job_list = [doc.to_dict() for doc in jobs]
+    try:
+        params = list_params()
+        jobs, next_token = query_page(db.collection('jobs'), **params)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Jeton de la page suivante dans X-Next-Cursor (à repasser en start_after)
+    headers = {'X-Next-Cursor': next_token} if next_token else {}
+    rows = (project(doc.to_dict(), params['fields']) for doc in jobs)
+    if wants_ndjson():
+        return ndjson_response(rows, headers)
+    job_list = list(rows)
     logger.debug(f"Nombre d'offres trouvées: {len(job_list)}")
-    return jsonify(job_list), 200
+    return jsonify(job_list), 200, headers
 
 #  Lire les offres d'un recruteur
 @app.route('/jobs/recruiter/<recruiter_id>', methods=['GET'])
@@ -157,6 +176,8 @@ def update_job(job_id):
         logger.warning(f"Job non trouvé pour mise à jour: {job_id}")
         return jsonify({'error': 'Job not found'}), 404
     data = request.get_json()
+    if 'skills' in data:
+        data['skills_canonical'] = canonicalize_skills(data['skills'])
     doc_ref.update(data)
     logger.debug(f"Job mis à jour avec succès: {job_id}")
     return jsonify({'message': 'Job updated'}), 200
@@ -174,6 +195,8 @@ def delete_job(job_id):
     return jsonify({'message': 'Job deleted'}), 200
 
 # Lancer le microservice
+startup('JobService', _import_started, firestore_client, firebase_auth)
+
 if __name__ == '__main__':
     logger.info("Démarrage du serveur sur le port 5002...")
     app.run(port=5002, debug=True)
\ No newline at end of file
@@ -1,68 +1,171 @@
+import time
+_import_started = time.perf_counter()
+
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import firebase_admin
-from firebase_admin import credentials, firestore
 import requests
+import heapq
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from common.bootstrap import Lazy, firestore_client, startup
+from common.skills import SkillVocabulary, overlap_score
+from common.pagination import (InvalidCursor, decode_cursor, encode_cursor, ndjson_response,
+                               parse_fields, project, wants_ndjson)
+from skill_index import IndexUnavailable, SkillIndex
+from cv_matrix import CVSkillMatrix
+from match_writer import MatchResultWriter
+from semantic_index import SemanticJobIndex
+from match_cache import MatchCache, skills_fingerprint
+
+# Init Firebase : client partagé, créé au premier usage
+db = Lazy(firestore_client)
+
+# Identifiants entiers des compétences canoniques, partagés par les index
+vocabulary = SkillVocabulary()
+
+# Index inversé compétence -> offres, chargé au premier appel puis tenu à jour
+job_index = SkillIndex(db, 'jobs', vocabulary)
+# Même principe côté CV, exposé en matrice creuse pour le matching inverse
+cv_index = SkillIndex(db, 'cv_analysis', vocabulary)
+cv_matrix = CVSkillMatrix(cv_index)
+
+# Index sémantique local des offres (mode=semantic), persisté sur disque
+semantic_index = SemanticJobIndex()
+job_index.add_listener(semantic_index.on_job_change)
+
+# Cache des scores (cv_id, job_id), invalidé quand un CV ou une offre change
+match_cache = MatchCache()
+cv_index.add_listener(match_cache.invalidate_cv)
+job_index.add_listener(match_cache.invalidate_job)
 
-# Init Firebase
-cred = credentials.Certificate("../../firebase/firebase_admin_key.json")
-firebase_admin.initialize_app(cred)
-db = firestore.client()
+# Les scores sont persistés en arrière-plan, par paquets ; une écriture
+# abandonnée retire l'entrée du cache pour que le score soit réécrit
+def forget_failed_writes(items):
+    for _, match_data in items:
+        match_cache.discard(match_data['cv_id'], match_data['job_id'], match_data)
+
+match_writer = MatchResultWriter(db, on_failure=forget_failed_writes)
+
+def persist_match(fingerprint, match_data):
+    """Met le score en cache puis en file d'écriture (dans cet ordre : un échec rapide l'évince)."""
+    cv_id, job_id = match_data['cv_id'], match_data['job_id']
+    match_cache.put(cv_id, job_id, fingerprint, match_data)
+    try:
+        match_writer.submit(f'{cv_id}_{job_id}', match_data)
+    except Exception:
+        match_cache.discard(cv_id, job_id, match_data)
+        raise
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['X-Next-Cursor'])
+
+# Compétences (telles que saisies + bitset) d'un document, depuis l'index
+# en mémoire ou, s'il n'y est pas encore, depuis Firestore
+def load_profile(index, doc_id):
+    index.start()
+    skills = index.skills_of(doc_id)
+    bits = index.bits_of(doc_id)
+    if skills is not None and bits is not None:
+        return skills, bits
+    doc = db.collection(index.collection).document(doc_id).get()
+    if not doc.exists:
+        return None, None
+    data = doc.to_dict()
+    return data.get("skills", []), index.encode(data)[1]
+
+# Score d'un couple (cv, offre) : cache, sinon calcul + écriture différée.
+# Retourne (match_data, None) ou (None, message d'erreur)
+def match_pair(cv_id, job_id):
+    # --- 1. Récupération des données du CV analysé
+    candidate_skills, candidate_bits = load_profile(cv_index, cv_id)
+    if candidate_skills is None:
+        return None, 'CV not found'
+
+    # --- 2. Récupération de l’offre
+    job_skills, job_bits = load_profile(job_index, job_id)
+    if job_skills is None:
+        return None, 'Job not found'
 
-# Scoring simple basé sur les compétences
-def calculate_score(candidate_skills, job_skills):
-    if not candidate_skills or not job_skills:
-        return 0
-    match_count = len(set(candidate_skills) & set(job_skills))
-    return round((match_count / len(job_skills)) * 100, 2)
+    # --- 3. Score déjà calculé pour ces mêmes compétences ?
+    fingerprint = skills_fingerprint(candidate_skills, job_skills)
+    cached = match_cache.get(cv_id, job_id, fingerprint)
+    if cached is not None:
+        return cached, None
+
+    # --- 4. Calcul du score de compatibilité
+    score = overlap_score(candidate_bits, job_bits)
+
+    # --- 5. Enregistrement du score dans Firestore
+    match_data = {
+        'cv_id': cv_id,
+        'job_id': job_id,
+        'candidate_skills': candidate_skills,
+        'job_skills': job_skills,
+        'match_score': score
+    }
+
+    # Ajouter les résultats dans la collection 'match_results' (écriture différée)
+    persist_match(fingerprint, match_data)
+    return match_data, None
 
 # Route pour matcher un candidat à une offre
 @app.route('/match/<cv_id>/<job_id>', methods=['GET'])
 def match_candidate(cv_id, job_id):
     try:
-        # --- 1. Récupération des données du CV analysé (via Firestore ou AIService)
-        cv_doc = db.collection('cv_analysis').document(cv_id).get()
-        if not cv_doc.exists:
-            return jsonify({'error': 'CV not found'}), 404
-        cv_data = cv_doc.to_dict()
-        candidate_skills = cv_data.get("skills", [])
+        match_data, error = match_pair(cv_id, job_id)
+        if error:
+            return jsonify({'error': error}), 404
+        return jsonify(match_data)
 
-        # --- 2. Récupération de l’offre (depuis JobService via Firestore)
-        job_doc = db.collection('jobs').document(job_id).get()
-        if not job_doc.exists:
-            return jsonify({'error': 'Job not found'}), 404
-        job_data = job_doc.to_dict()
-        job_skills = job_data.get("skills", [])
-
-        # --- 3. Calcul du score de compatibilité
-        score = calculate_score(candidate_skills, job_skills)
-
-        # --- 4. Enregistrement du score dans Firestore
-        match_data = {
-            'cv_id': cv_id,
-            'job_id': job_id,
-            'candidate_skills': candidate_skills,
-            'job_skills': job_skills,
-            'match_score': score
-        }
-        
-        # Ajouter les résultats dans la collection 'match_results'
-        db.collection('match_results').document(f'{cv_id}_{job_id}').set(match_data)
-
-        return jsonify({
-            'cv_id': cv_id,
-            'job_id': job_id,
-            'candidate_skills': candidate_skills,
-            'job_skills': job_skills,
-            'match_score': score
-        })
+    except IndexUnavailable as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Plusieurs couples en un appel : {"pairs": [{"cv_id": ..., "job_id": ...}, ...]}
+MAX_BULK_PAIRS = 1000
 
+@app.route('/match/bulk', methods=['POST'])
+def match_bulk():
+    data = request.get_json(silent=True) or {}
+    pairs = data.get('pairs')
+    if not isinstance(pairs, list) or not pairs:
+        return jsonify({'error': 'No pairs provided'}), 400
+    if len(pairs) > MAX_BULK_PAIRS:
+        return jsonify({'error': f'Too many pairs (max {MAX_BULK_PAIRS})'}), 400
+
+    try:
+        job_index.start()
+        cv_index.start()
+        results, errors = [], []
+        for pair in pairs:
+            cv_id, job_id = (pair or {}).get('cv_id'), (pair or {}).get('job_id')
+            if not cv_id or not job_id:
+                errors.append({'cv_id': cv_id, 'job_id': job_id, 'error': 'cv_id and job_id required'})
+                continue
+            match_data, error = match_pair(cv_id, job_id)
+            if error:
+                errors.append({'cv_id': cv_id, 'job_id': job_id, 'error': error})
+            else:
+                results.append(match_data)
+        return jsonify({'results': results, 'errors': errors})
+
+    except IndexUnavailable as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Compteurs du cache de matching
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(match_cache.stats())
+
+# Ordre des résultats : score décroissant puis job_id (sert aussi de cursor)
+def result_order(match_data):
+    return (-match_data['match_score'], match_data['job_id'])
+
 @app.route('/match_all_jobs/<cv_id>', methods=['GET'])
 def match_all_jobs(cv_id):
     try:
@@ -72,35 +175,137 @@ def match_all_jobs(cv_id):
             return jsonify({'error': 'CV not found'}), 404
         cv_data = cv_doc.to_dict()
         candidate_skills = cv_data.get("skills", [])
+        candidate_ids, candidate_bits = cv_index.encode(cv_data)
 
-        # --- 2. Récupérer toutes les offres d’emploi
-        jobs_ref = db.collection('jobs').stream()
-        results = []
+        # `top_k` est conservé comme alias de `limit`
+        limit = request.args.get('limit', type=int)
+        if limit is None:
+            limit = request.args.get('top_k', type=int)
+        min_score = request.args.get('min_score', default=0, type=float)
+        fields = parse_fields(request.args.get('fields'))
+        ndjson = wants_ndjson()
+        try:
+            cursor = decode_cursor(request.args.get('cursor'))
+            if cursor is not None and not (isinstance(cursor, dict) and {'s', 'j'} <= cursor.keys()):
+                raise InvalidCursor("Cursor invalide")
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+
+        # --- Mode sémantique : plus proches voisins dans l'index ANN
+        if request.args.get('mode') == 'semantic':
+            job_index.start()
+            results = []
+            for job_id, score in semantic_index.search(cv_data, limit or 20, min_score):
+                results.append(project({
+                    'cv_id': cv_id,
+                    'job_id': job_id,
+                    'candidate_skills': candidate_skills,
+                    'job_skills': job_index.skills_of(job_id) or [],
+                    'match_score': score,
+                    'mode': 'semantic'
+                }, fields))
+            return ndjson_response(results) if ndjson else jsonify(results)
+
+        # --- 2. Seules les offres partageant au moins une compétence sont scorées
+        # (les deux index sont chargés avant de remplir le cache)
+        job_index.start()
+        cv_index.start()
+        candidates = job_index.candidates(candidate_ids)
+
+        def scored():
+            for job_id in candidates:
+                job_skills = job_index.skills_of(job_id)
+                job_bits = job_index.bits_of(job_id)
+                if job_skills is None or job_bits is None:
+                    continue
+
+                score = overlap_score(candidate_bits, job_bits)
+
+                match_data = {
+                    'cv_id': cv_id,
+                    'job_id': job_id,
+                    'candidate_skills': candidate_skills,
+                    'job_skills': job_skills,
+                    'match_score': score
+                }
+
+                # Enregistrer le score dans Firestore (écriture différée),
+                # sauf s'il y est déjà pour ces mêmes compétences
+                fingerprint = skills_fingerprint(candidate_skills, job_skills)
+                if not match_cache.is_current(cv_id, job_id, fingerprint):
+                    persist_match(fingerprint, match_data)
+
+                if score >= min_score:
+                    yield match_data
 
-        for job_doc in jobs_ref:
-            job_data = job_doc.to_dict()
-            job_id = job_doc.id
-            job_skills = job_data.get("skills", [])
+        # --- 3a. Flux NDJSON non paginé : chaque résultat part dès qu'il est scoré
+        if limit is None and cursor is None:
+            if ndjson:
+                return ndjson_response(project(r, fields) for r in scored())
+            results = sorted(scored(), key=result_order)
+            return jsonify([project(r, fields) for r in results])
 
-            score = calculate_score(candidate_skills, job_skills)
+        # --- 3b. Page triée : tas borné à `limit` éléments après le cursor
+        after = (-cursor['s'], cursor['j']) if cursor else None
+        page_size = limit if limit is not None and limit >= 0 else 50
+        page = heapq.nsmallest(
+            page_size,
+            (r for r in scored() if after is None or result_order(r) > after),
+            key=result_order
+        )
+        headers = {}
+        if page and len(page) == page_size:
+            last = page[-1]
+            headers['X-Next-Cursor'] = encode_cursor({'s': last['match_score'], 'j': last['job_id']})
 
+        results = [project(r, fields) for r in page]
+        if ndjson:
+            return ndjson_response(results, headers)
+        return jsonify(results), 200, headers
+
+    except IndexUnavailable as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Route inverse : classer tous les CV analysés pour une offre
+@app.route('/match_all_cvs/<job_id>', methods=['GET'])
+def match_all_cvs(job_id):
+    try:
+        top_k = request.args.get('top_k', default=50, type=int)
+        min_score = request.args.get('min_score', default=0, type=float)
+
+        # --- 1. Récupérer les compétences de l'offre
+        job_index.start()
+        job_skills = job_index.skills_of(job_id)
+        job_skill_ids = job_index.ids_of(job_id)
+        if job_skills is None or job_skill_ids is None:
+            return jsonify({'error': 'Job not found'}), 404
+
+        # --- 2. Scorer tous les CV en un seul produit matrice-vecteur
+        cv_index.start()
+        results = []
+        for cv_id, score in cv_matrix.top_candidates(job_skill_ids, top_k, min_score):
             match_data = {
                 'cv_id': cv_id,
                 'job_id': job_id,
-                'candidate_skills': candidate_skills,
+                'candidate_skills': cv_index.skills_of(cv_id) or [],
                 'job_skills': job_skills,
                 'match_score': score
             }
-
-            # Enregistrer le score dans Firestore
-            db.collection('match_results').document(f'{cv_id}_{job_id}').set(match_data)
-
+            fingerprint = skills_fingerprint(match_data['candidate_skills'], job_skills)
+            if not match_cache.is_current(cv_id, job_id, fingerprint):
+                persist_match(fingerprint, match_data)
             results.append(match_data)
 
         return jsonify(results)
 
+    except IndexUnavailable as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+startup('MatchingService', _import_started, firestore_client)
+
 if __name__ == '__main__':
     app.run(port=5004, debug=True)
\ No newline at end of file
@@ -0,0 +1,77 @@
+import threading
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+class CVSkillMatrix:
+    """Matrice creuse CV x compétence (CSR) construite à partir d'un SkillIndex.
+
+    Permet de scorer tous les CV analysés contre une offre en un seul
+    produit matrice-vecteur. La matrice est reconstruite paresseusement
+    quand l'index sous-jacent a changé.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self._lock = threading.Lock()
+        self._version = None
+        self._matrix = None
+        self._cv_ids = []
+
+    def _ensure_built(self):
+        with self._lock:
+            if self._version == self.index.version:
+                return self._matrix, self._cv_ids
+
+            # Les colonnes sont directement les identifiants du vocabulaire
+            version, docs = self.index.snapshot()
+            cv_ids = []
+            indptr = [0]
+            indices = []
+            for cv_id, skill_ids in docs.items():
+                indices.extend(skill_ids)
+                indptr.append(len(indices))
+                cv_ids.append(cv_id)
+
+            data = np.ones(len(indices), dtype=np.float32)
+            self._matrix = csr_matrix(
+                (data, np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+                shape=(len(cv_ids), max(len(self.index.vocabulary), 1))
+            )
+            self._cv_ids = cv_ids
+            self._version = version
+            return self._matrix, self._cv_ids
+
+    def top_candidates(self, job_skill_ids, top_k=50, min_score=0):
+        """Retourne [(cv_id, score)] triés par score décroissant.
+
+        Même formule que overlap_score : compétences communes / nombre de
+        compétences canoniques de l'offre. Les CV sans aucune compétence
+        commune sont ignorés.
+        """
+        if not job_skill_ids or top_k <= 0:
+            return []
+        matrix, cv_ids = self._ensure_built()
+        if not cv_ids:
+            return []
+
+        cols = [skill_id for skill_id in job_skill_ids if skill_id < matrix.shape[1]]
+        if not cols:
+            return []
+        job_vector = np.zeros(matrix.shape[1], dtype=np.float32)
+        job_vector[cols] = 1.0
+
+        overlap = (matrix @ job_vector).astype(np.float64)
+        scores = np.round(overlap / len(job_skill_ids) * 100, 2)
+
+        eligible = np.flatnonzero((overlap > 0) & (scores >= min_score))
+        if eligible.size == 0:
+            return []
+
+        # Tri partiel : seuls les top_k meilleurs sont triés
+        if eligible.size > top_k:
+            part = np.argpartition(-scores[eligible], top_k - 1)[:top_k]
+            eligible = eligible[part]
+        order = eligible[np.argsort(-scores[eligible], kind='stable')]
+        return [(cv_ids[i], float(scores[i])) for i in order]
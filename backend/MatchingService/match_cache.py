@@ -0,0 +1,113 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+MAX_ENTRIES = int(os.getenv("MATCH_CACHE_SIZE", "100000"))
+
+
+def skills_fingerprint(candidate_skills, job_skills):
+    """Empreinte du contenu qui détermine un résultat de matching."""
+    h = hashlib.sha1()
+    for skills in (candidate_skills, job_skills):
+        h.update('\x1f'.join(skills or []).encode('utf-8'))
+        h.update(b'\x1e')
+    return h.hexdigest()
+
+
+class MatchCache:
+    """Cache LRU borné des résultats (cv_id, job_id).
+
+    Une entrée n'est valide que si l'empreinte des compétences n'a pas
+    changé ; elle est aussi supprimée dès que le CV ou l'offre source est
+    modifié. Une entrée présente signifie que match_results contient déjà
+    ce score (ou qu'il est en file d'écriture) : l'écriture Firestore peut
+    être évitée. Une écriture abandonnée retire l'entrée via discard().
+    """
+
+    def __init__(self, maxsize=MAX_ENTRIES):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # (cv_id, job_id) -> (empreinte, match_data)
+        self._by_cv = {}
+        self._by_job = {}
+        self.hits = 0
+        self.misses = 0
+        self.skipped_writes = 0
+        self.invalidations = 0
+
+    def get(self, cv_id, job_id, fingerprint):
+        with self._lock:
+            entry = self._entries.get((cv_id, job_id))
+            if entry is None or entry[0] != fingerprint:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((cv_id, job_id))
+            self.hits += 1
+            self.skipped_writes += 1
+            return entry[1]
+
+    def is_current(self, cv_id, job_id, fingerprint):
+        """Vrai si le score stocké est à jour (sans compter de hit/miss)."""
+        with self._lock:
+            entry = self._entries.get((cv_id, job_id))
+            current = entry is not None and entry[0] == fingerprint
+            if current:
+                self.skipped_writes += 1
+            return current
+
+    def put(self, cv_id, job_id, fingerprint, match_data):
+        key = (cv_id, job_id)
+        with self._lock:
+            self._entries[key] = (fingerprint, match_data)
+            self._entries.move_to_end(key)
+            self._by_cv.setdefault(cv_id, set()).add(key)
+            self._by_job.setdefault(job_id, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                old_key, _ = self._entries.popitem(last=False)
+                self._unlink(old_key)
+
+    def discard(self, cv_id, job_id, match_data):
+        """Retire l'entrée si elle porte encore ce résultat (écriture Firestore échouée)."""
+        key = (cv_id, job_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is match_data:
+                del self._entries[key]
+                self._unlink(key)
+
+    def _unlink(self, key):
+        cv_id, job_id = key
+        for mapping, doc_id in ((self._by_cv, cv_id), (self._by_job, job_id)):
+            keys = mapping.get(doc_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del mapping[doc_id]
+
+    def _invalidate(self, mapping, doc_id):
+        with self._lock:
+            for key in list(mapping.get(doc_id, ())):
+                if self._entries.pop(key, None) is not None:
+                    self.invalidations += 1
+                self._unlink(key)
+
+    # Branchés sur les listeners des SkillIndex
+    def invalidate_cv(self, cv_id, data=None):
+        self._invalidate(self._by_cv, cv_id)
+
+    def invalidate_job(self, job_id, data=None):
+        self._invalidate(self._by_job, job_id)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0,
+                'skipped_writes': self.skipped_writes,
+                'invalidations': self.invalidations
+            }
@@ -0,0 +1,101 @@
+import atexit
+import os
+import queue
+import threading
+
+# Limite Firestore : 500 opérations par WriteBatch
+MAX_BATCH_SIZE = 500
+MAX_QUEUE_SIZE = int(os.getenv("MATCH_WRITER_QUEUE_SIZE", "50000"))
+FLUSH_INTERVAL = float(os.getenv("MATCH_WRITER_FLUSH_SECONDS", "0.5"))
+PUT_TIMEOUT = float(os.getenv("MATCH_WRITER_PUT_TIMEOUT", "30"))
+
+_STOP = object()
+
+
+class MatchResultWriter:
+    """File d'écriture différée (write-behind) pour la collection match_results.
+
+    Les routes déposent les résultats avec submit() et répondent tout de
+    suite ; un thread de fond les regroupe par paquets de 500 maximum et les
+    envoie via un WriteBatch Firestore. La file est bornée : quand elle est
+    pleine, submit() bloque (back-pressure). Les écritures en attente sont
+    vidées à l'arrêt du processus. Un paquet abandonné après ses tentatives
+    est passé à on_failure([(doc_id, data), ...]).
+    """
+
+    def __init__(self, db, collection='match_results', max_queue=MAX_QUEUE_SIZE, on_failure=None):
+        self.db = db
+        self.collection = collection
+        self.on_failure = on_failure
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self.written = 0
+        self.failed = 0
+        self._thread = threading.Thread(target=self._run, name='match-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, doc_id, data):
+        if self._closed:
+            raise RuntimeError("MatchResultWriter fermé")
+        self._queue.put((doc_id, data), timeout=PUT_TIMEOUT)
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def flush(self):
+        """Bloque jusqu'à ce que tout ce qui a été soumis soit écrit."""
+        self._queue.join()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    # --- Thread de fond ---
+    def _run(self):
+        stop = False
+        while not stop:
+            try:
+                first = self._queue.get(timeout=FLUSH_INTERVAL)
+            except queue.Empty:
+                continue
+            items = []
+            if first is _STOP:
+                stop = True
+            else:
+                items.append(first)
+            while len(items) < MAX_BATCH_SIZE and not stop:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                else:
+                    items.append(item)
+
+            if items:
+                self._commit(items)
+            for _ in range(len(items) + (1 if stop else 0)):
+                self._queue.task_done()
+
+    def _commit(self, items):
+        for attempt in range(2):
+            try:
+                batch = self.db.batch()
+                for doc_id, data in items:
+                    batch.set(self.db.collection(self.collection).document(doc_id), data)
+                batch.commit()
+                self.written += len(items)
+                return
+            except Exception as e:
+                print(f"Erreur écriture match_results (tentative {attempt + 1}): {e}")
+        self.failed += len(items)
+        if self.on_failure is not None:
+            try:
+                self.on_failure(items)
+            except Exception as e:
+                print(f"Erreur callback on_failure match_results: {e}")
@@ -0,0 +1,220 @@
+"""Recalcul hors ligne de toute la matrice cv x offre dans match_results.
+
+À lancer depuis backend/MatchingService après un changement de taxonomie
+ou de scoring :
+
+    python recompute_matches.py --workers 8
+
+cv_analysis et jobs sont lus une seule fois ; les CV sont répartis par
+paquets sur un ProcessPoolExecutor et les résultats écrits avec un
+BulkWriter Firestore. Les compétences sont recanonicalisées depuis
+`skills` (skills_canonical reflète l'ancienne taxonomie) et les anciens
+documents d'un CV qui ne sont pas réécrits (plus aucune compétence
+commune, offre supprimée) sont effacés.
+
+Chaque paquet dont toutes les écritures ont réussi est noté dans un
+fichier de checkpoint : relancer la commande reprend là où elle s'était
+arrêtée et retraite les CV en échec. --dry-run ne lit ni n'écrit ce
+fichier : il ne touche pas à l'état de reprise d'un vrai recalcul.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from common.skills import SkillVocabulary, canonicalize_skills, overlap_score, to_bitset
+
+# Tentatives par écriture avant de la déclarer en échec
+MAX_WRITE_ATTEMPTS = 5
+
+# Données des offres, chargées une fois par processus worker
+_jobs = None
+
+
+def _encode(vocabulary, data):
+    # Toujours depuis `skills` : le but est d'appliquer la taxonomie actuelle
+    skill_ids = vocabulary.encode(canonicalize_skills(data.get('skills', [])))
+    return list(skill_ids), to_bitset(skill_ids)
+
+
+def _init_worker(job_ids, job_bits, by_skill):
+    global _jobs
+    _jobs = (job_ids, job_bits, by_skill)
+
+
+def score_shard(shard, include_zero):
+    """[(cv_id, [(index_offre, score), ...])] pour un paquet de CV."""
+    job_ids, job_bits, by_skill = _jobs
+    results = []
+    for cv_id, skill_ids, bits in shard:
+        if include_zero:
+            candidates = range(len(job_ids))
+        else:
+            candidates = set()
+            for skill_id in skill_ids:
+                candidates.update(by_skill.get(skill_id, ()))
+        results.append((cv_id, [(j, overlap_score(bits, job_bits[j])) for j in candidates]))
+    return results
+
+
+def load_checkpoint(path):
+    done = set()
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    done.update(json.loads(line))
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recalcule match_results pour tous les couples cv x offre")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--shard-size', type=int, default=200, help="CV par tâche")
+    parser.add_argument('--checkpoint', default='recompute_checkpoint.jsonl')
+    parser.add_argument('--reset', action='store_true', help="ignore le checkpoint existant")
+    parser.add_argument('--include-zero', action='store_true',
+                        help="écrit aussi les couples sans compétence commune")
+    parser.add_argument('--dry-run', action='store_true', help="calcule sans écrire dans Firestore")
+    args = parser.parse_args()
+
+    from common.bootstrap import firestore_client
+    db = firestore_client()
+
+    # --- 1. Chargement unique des deux collections
+    t0 = time.time()
+    vocabulary = SkillVocabulary()
+    job_ids, job_bits, job_skills, by_skill = [], [], [], {}
+    for doc in db.collection('jobs').stream():
+        data = doc.to_dict() or {}
+        skill_ids, bits = _encode(vocabulary, data)
+        for skill_id in skill_ids:
+            by_skill.setdefault(skill_id, []).append(len(job_ids))
+        job_ids.append(doc.id)
+        job_bits.append(bits)
+        job_skills.append(data.get('skills', []))
+
+    # Le checkpoint n'est utilisé que par un vrai recalcul
+    use_checkpoint = not args.dry_run
+    if use_checkpoint and args.reset and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    done = load_checkpoint(args.checkpoint) if use_checkpoint else set()
+
+    cvs, cv_skills = [], {}
+    for doc in db.collection('cv_analysis').stream():
+        if doc.id in done:
+            continue
+        data = doc.to_dict() or {}
+        skill_ids, bits = _encode(vocabulary, data)
+        cvs.append((doc.id, skill_ids, bits))
+        cv_skills[doc.id] = data.get('skills', [])
+    cvs.sort(key=lambda cv: cv[0])
+
+    # Documents existants par CV : ceux qui ne sont pas réécrits seront effacés
+    existing = {}
+    if not args.dry_run:
+        for doc in db.collection('match_results').select(['cv_id']).stream():
+            cv_id = (doc.to_dict() or {}).get('cv_id')
+            if cv_id in cv_skills:
+                existing.setdefault(cv_id, set()).add(doc.id)
+    print(f"{len(job_ids)} offres, {len(cvs)} CV à traiter ({len(done)} déjà faits) "
+          f"chargés en {time.time() - t0:.1f}s")
+
+    shards = [cvs[i:i + args.shard_size] for i in range(0, len(cvs), args.shard_size)]
+    if not shards:
+        print("Rien à recalculer")
+        if use_checkpoint and os.path.exists(args.checkpoint):
+            os.remove(args.checkpoint)
+        return
+
+    # --- 2. Calcul réparti + écriture en flux
+    writer = None if args.dry_run else db.bulk_writer()
+    failures, failures_lock = [], threading.Lock()
+
+    def on_write_error(failure, _writer):
+        if failure.attempts < MAX_WRITE_ATTEMPTS:
+            return True
+        with failures_lock:
+            failures.append((failure.operation.reference.id, failure.message))
+        return False
+
+    if writer is not None:
+        writer.on_write_error(on_write_error)
+    collection = db.collection('match_results')
+    pairs = deleted = 0
+    failed_cvs = set()
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=(job_ids, job_bits, by_skill)) as pool, \
+            (open(args.checkpoint, 'a') if use_checkpoint else nullcontext()) as checkpoint:
+        pending = set()
+        queue = iter(shards)
+        for shard in queue:
+            pending.add(pool.submit(score_shard, shard, args.include_zero))
+            if len(pending) >= args.workers * 2:
+                break
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                shard_result = future.result()
+                for cv_id, scores in shard_result:
+                    stale = existing.pop(cv_id, set())
+                    for j, score in scores:
+                        doc_id = f'{cv_id}_{job_ids[j]}'
+                        stale.discard(doc_id)
+                        if writer is not None:
+                            writer.set(collection.document(doc_id), {
+                                'cv_id': cv_id,
+                                'job_id': job_ids[j],
+                                'candidate_skills': cv_skills[cv_id],
+                                'job_skills': job_skills[j],
+                                'match_score': score
+                            })
+                        pairs += 1
+                    for doc_id in stale:
+                        writer.delete(collection.document(doc_id))
+                        deleted += 1
+                # Le paquet n'est marqué fait qu'une fois ses écritures confirmées
+                shard_ids = [cv_id for cv_id, _ in shard_result]
+                if writer is not None:
+                    writer.flush()
+                    with failures_lock:
+                        shard_failures, failures[:] = list(failures), []
+                    shard_failed = set()
+                    for doc_id, message in shard_failures:
+                        print(f"Échec écriture {doc_id}: {message}")
+                        matched = [c for c in shard_ids if doc_id.startswith(c + '_')]
+                        # Document non attribuable : le paquet entier sera refait
+                        shard_failed.update(matched or shard_ids)
+                    failed_cvs |= shard_failed
+                    shard_ids = [cv_id for cv_id in shard_ids if cv_id not in shard_failed]
+                if checkpoint is not None:
+                    checkpoint.write(json.dumps(shard_ids) + '\n')
+                    checkpoint.flush()
+
+                elapsed = time.time() - start
+                print(f"{pairs} couples écrits, {pairs / elapsed:.0f} couples/s")
+                shard = next(queue, None)
+                if shard is not None:
+                    pending.add(pool.submit(score_shard, shard, args.include_zero))
+
+    if writer is not None:
+        writer.close()
+    elapsed = time.time() - start
+    print(f"Terminé : {pairs} couples en {elapsed:.1f}s ({pairs / max(elapsed, 1e-9):.0f} couples/s), "
+          f"{deleted} anciens documents effacés")
+    if failed_cvs:
+        print(f"{len(failed_cvs)} CV en échec : relancer la commande pour les retraiter "
+              f"(checkpoint conservé : {args.checkpoint})")
+        sys.exit(1)
+    if use_checkpoint:
+        os.remove(args.checkpoint)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,379 @@
+"""Matching sémantique local (sans API distante).
+
+- HashedNgramEmbedder : TF-IDF sur n-grammes de caractères hachés, réduit
+  par SVD randomisée (LSA) puis normalisé L2.
+- IVFIndex : index approché par listes inversées (k-means sphérique) ;
+  les vecteurs sont persistés en .npy et relus en mémoire mappée.
+- SemanticJobIndex : maintient l'index des offres à jour de façon
+  incrémentale (delta en mémoire + reconstruction en arrière-plan).
+"""
+import hashlib
+import json
+import math
+import os
+import shutil
+import threading
+import zlib
+from collections import Counter
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from common.skills import fold
+
+# Rangé à côté du module : le même index quel que soit le dossier de lancement
+INDEX_DIR = os.getenv("MATCHING_SEMANTIC_DIR",
+                      os.path.join(os.path.dirname(os.path.abspath(__file__)), 'semantic_index'))
+N_COMPONENTS = int(os.getenv("MATCHING_SEMANTIC_DIM", "128"))
+N_PROBE = int(os.getenv("MATCHING_SEMANTIC_NPROBE", "8"))
+# Reconstruction complète quand le delta dépasse ce ratio de l'index principal
+REBUILD_RATIO = float(os.getenv("MATCHING_SEMANTIC_REBUILD_RATIO", "0.2"))
+MAX_TEXT_CHARS = 2000
+
+
+def job_text(data):
+    skills = data.get('skills_canonical') or data.get('skills', [])
+    parts = [data.get('title', ''), ' '.join(skills), ' '.join(skills), data.get('description', '')]
+    return fold(' '.join(p for p in parts if p))[:MAX_TEXT_CHARS]
+
+
+def cv_text(data):
+    skills = data.get('skills_canonical') or data.get('skills', [])
+    parts = [' '.join(skills), ' '.join(skills), data.get('experience', ''), data.get('summary', '')]
+    return fold(' '.join(p for p in parts if p))[:MAX_TEXT_CHARS]
+
+
+def _content_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+class HashedNgramEmbedder:
+    def __init__(self, n_features=2 ** 18, ngram_range=(3, 5)):
+        self.n_features = n_features
+        self.ngram_range = ngram_range
+        self.active = None       # features vues à l'entraînement (triées)
+        self.idf = None
+        self.projection = None   # (len(active), n_components)
+        self._position = {}
+
+    def _counts(self, text):
+        low, high = self.ngram_range
+        counts = Counter()
+        for word in text.split():
+            padded = f" {word} "
+            for n in range(low, high + 1):
+                for i in range(max(len(padded) - n + 1, 1)):
+                    gram = padded[i:i + n]
+                    counts[zlib.crc32(gram.encode('utf-8')) & (self.n_features - 1)] += 1
+        return counts
+
+    def _matrix(self, all_counts):
+        indptr, indices, data = [0], [], []
+        for counts in all_counts:
+            for feature, tf in counts.items():
+                pos = self._position.get(feature)
+                if pos is not None:
+                    indices.append(pos)
+                    data.append((1.0 + math.log(tf)) * self.idf[pos])
+            indptr.append(len(indices))
+        matrix = csr_matrix((np.asarray(data, dtype=np.float32), indices, indptr),
+                            shape=(len(all_counts), len(self.active)))
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return csr_matrix(matrix.multiply(1.0 / norms[:, None]))
+
+    def fit(self, texts, n_components=N_COMPONENTS, n_iter=4, seed=0):
+        all_counts = [self._counts(t) for t in texts]
+        df = Counter()
+        for counts in all_counts:
+            df.update(counts.keys())
+        self.active = np.array(sorted(df), dtype=np.int64)
+        self._position = {int(f): i for i, f in enumerate(self.active)}
+        n_docs = len(texts)
+        if not len(self.active):
+            self.idf = np.zeros(0, dtype=np.float32)
+            self.projection = None
+            return self
+        self.idf = np.array([math.log((1 + n_docs) / (1 + df[int(f)])) + 1.0 for f in self.active],
+                            dtype=np.float32)
+        self.projection = self._randomized_svd(self._matrix(all_counts), n_components, n_iter, seed)
+        return self
+
+    @staticmethod
+    def _randomized_svd(matrix, n_components, n_iter, seed, n_oversamples=10):
+        """SVD tronquée randomisée (Halko et al.) : retourne V (n_features, k)."""
+        n_rows, n_cols = matrix.shape
+        k = max(1, min(n_components, n_rows, n_cols))
+        sketch = min(k + n_oversamples, n_rows, n_cols)
+        rng = np.random.default_rng(seed)
+        q = matrix @ rng.standard_normal((n_cols, sketch)).astype(np.float32)
+        q, _ = np.linalg.qr(q)
+        for _ in range(n_iter):
+            q, _ = np.linalg.qr(matrix.T @ q)
+            q, _ = np.linalg.qr(matrix @ q)
+        b = np.asarray((matrix.T @ q).T)
+        _, _, vt = np.linalg.svd(b, full_matrices=False)
+        return np.ascontiguousarray(vt[:k].T, dtype=np.float32)
+
+    def transform(self, texts):
+        if self.projection is None or not len(self.active):
+            return np.zeros((len(texts), 1), dtype=np.float32)
+        reduced = self._matrix([self._counts(t) for t in texts]) @ self.projection
+        return _normalize_rows(np.asarray(reduced))
+
+    @property
+    def dim(self):
+        return self.projection.shape[1] if self.projection is not None else 1
+
+    def save(self, path):
+        np.save(os.path.join(path, 'active.npy'), self.active)
+        np.save(os.path.join(path, 'idf.npy'), self.idf)
+        np.save(os.path.join(path, 'projection.npy'), self.projection)
+
+    @classmethod
+    def load(cls, path, n_features=2 ** 18):
+        embedder = cls(n_features)
+        embedder.active = np.load(os.path.join(path, 'active.npy'))
+        embedder.idf = np.load(os.path.join(path, 'idf.npy'))
+        embedder.projection = np.load(os.path.join(path, 'projection.npy'))
+        embedder._position = {int(f): i for i, f in enumerate(embedder.active)}
+        return embedder
+
+
+class IVFIndex:
+    """Index à listes inversées sur vecteurs normalisés (similarité cosinus)."""
+
+    def __init__(self, vectors, ids, hashes, centroids, assign):
+        self.vectors = vectors
+        self.ids = ids
+        self.hashes = hashes
+        self.centroids = centroids
+        self.assign = assign
+        self.row_of = {doc_id: i for i, doc_id in enumerate(ids)}
+        self.lists = [np.flatnonzero(assign == c) for c in range(len(centroids))]
+
+    @classmethod
+    def build(cls, vectors, ids, hashes, n_iter=10, seed=0):
+        n = len(ids)
+        n_lists = max(1, int(math.sqrt(n)))
+        if n == 0:
+            return cls(vectors, ids, hashes, np.zeros((1, vectors.shape[1]), np.float32), np.zeros(0, np.int32))
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(n, n_lists, replace=False)].copy()
+        assign = np.zeros(n, dtype=np.int32)
+        for _ in range(n_iter):
+            assign = np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+            for c in range(n_lists):
+                members = vectors[assign == c]
+                if len(members):
+                    centroids[c] = members.sum(axis=0)
+            centroids = _normalize_rows(centroids)
+        return cls(vectors, ids, hashes, centroids, assign)
+
+    def search(self, query, top_k, n_probe=N_PROBE, exclude=()):
+        if not self.ids:
+            return []
+        probe = np.argsort(-(self.centroids @ query))[:n_probe]
+        rows = np.concatenate([self.lists[c] for c in probe])
+        if not rows.size:
+            return []
+        sims = np.asarray(self.vectors[rows]) @ query
+        order = np.argsort(-sims)
+        results = []
+        for i in order:
+            doc_id = self.ids[rows[i]]
+            if doc_id in exclude:
+                continue
+            results.append((doc_id, float(sims[i])))
+            if len(results) >= top_k:
+                break
+        return results
+
+    def save(self, path):
+        np.save(os.path.join(path, 'vectors.npy'), np.ascontiguousarray(self.vectors, dtype=np.float32))
+        np.save(os.path.join(path, 'centroids.npy'), self.centroids)
+        np.save(os.path.join(path, 'assign.npy'), self.assign)
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'ids': self.ids, 'hashes': self.hashes}, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        return cls(np.load(os.path.join(path, 'vectors.npy'), mmap_mode='r'),
+                   meta['ids'], meta['hashes'],
+                   np.load(os.path.join(path, 'centroids.npy')),
+                   np.load(os.path.join(path, 'assign.npy')))
+
+
+class SemanticJobIndex:
+    """Index sémantique des offres, alimenté par le listener de SkillIndex."""
+
+    def __init__(self, path=INDEX_DIR):
+        self.path = path
+        self._lock = threading.RLock()       # état ; jamais tenu pendant un calcul
+        self._build_lock = threading.Lock()  # une seule construction initiale
+        self._texts = {}      # job_id -> texte courant
+        self._pending = {}    # job_id -> texte (None = supprimé) non encore appliqué
+        self._delta = {}      # job_id -> vecteur ajouté/modifié depuis le build
+        self._removed = set()
+        self._rebuilding = False
+        self._reconciled = False   # index disque comparé aux offres chargées
+        self.embedder = None
+        self.ivf = None
+        self._load()
+
+    def _load(self):
+        try:
+            if os.path.exists(os.path.join(self.path, 'meta.json')):
+                self.embedder = HashedNgramEmbedder.load(self.path)
+                self.ivf = IVFIndex.load(self.path)
+                print(f"Index sémantique chargé ({len(self.ivf.ids)} offres)")
+        except Exception as e:
+            print(f"Index sémantique illisible, reconstruction ({e})")
+            self.embedder, self.ivf = None, None
+
+    # --- Alimentation (appelé depuis le thread du listener) ---
+    def on_job_change(self, job_id, data):
+        with self._lock:
+            text = job_text(data) if data is not None else None
+            if text is None:
+                self._texts.pop(job_id, None)
+            else:
+                self._texts[job_id] = text
+            self._pending[job_id] = text
+
+    def _apply_pending(self):
+        with self._lock:
+            if self.ivf is None or not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            embedder = self.embedder
+            changed = {}
+            for job_id, text in pending.items():
+                row = self.ivf.row_of.get(job_id)
+                if text is None:
+                    self._delta.pop(job_id, None)
+                    if row is not None:
+                        self._removed.add(job_id)
+                elif row is not None and self.ivf.hashes[row] == _content_hash(text):
+                    # Rejoué par le listener au démarrage : rien n'a changé
+                    self._delta.pop(job_id, None)
+                    self._removed.discard(job_id)
+                else:
+                    changed[job_id] = text
+                    if row is not None:
+                        self._removed.add(job_id)
+        if not changed:
+            return
+        # Vecteurs calculés hors verrou : le listener et les requêtes ne les attendent pas
+        vectors = embedder.transform(list(changed.values()))
+        with self._lock:
+            if self.embedder is not embedder:
+                # Index reconstruit entre-temps : à réappliquer avec le nouvel embedder
+                for job_id, text in changed.items():
+                    self._pending.setdefault(job_id, text)
+                return
+            self._delta.update(zip(changed, vectors))
+            stale = len(self._delta) + len(self._removed)
+            if stale and stale > REBUILD_RATIO * max(len(self.ivf.ids), 1):
+                self._start_rebuild()
+
+    # --- Construction ---
+    def ensure_ready(self):
+        """À appeler une fois l'index des offres chargé (job_index.start()).
+
+        La construction se fait hors de self._lock, qui n'est pris que pour
+        lire les textes et installer le nouvel index : les mises à jour du
+        listener ne sont pas bloquées pendant ce temps.
+        """
+        if self.ivf is None:
+            with self._build_lock:
+                if self.ivf is None:
+                    with self._lock:
+                        self._pending.clear()
+                        self._reconciled = True
+                    self.rebuild()
+                    return
+        with self._lock:
+            if not self._reconciled:
+                # Offres supprimées pendant l'arrêt du service : le listener ne
+                # signale que les suppressions d'offres qu'il a déjà vues
+                for job_id in self.ivf.ids:
+                    if job_id not in self._texts:
+                        self._pending.setdefault(job_id, None)
+                self._reconciled = True
+        self._apply_pending()
+
+    def rebuild(self):
+        with self._lock:
+            texts = dict(self._texts)
+        ids = list(texts)
+        embedder = HashedNgramEmbedder().fit([texts[i] for i in ids])
+        vectors = embedder.transform([texts[i] for i in ids]) if ids else np.zeros((0, embedder.dim), np.float32)
+        ivf = IVFIndex.build(vectors, ids, [_content_hash(texts[i]) for i in ids])
+        self._persist(embedder, ivf)
+        with self._lock:
+            self.embedder, self.ivf = embedder, ivf
+            self._delta.clear()
+            self._removed.clear()
+            # Les modifications arrivées pendant la reconstruction restent en attente
+            for job_id, text in self._texts.items():
+                if texts.get(job_id) != text:
+                    self._pending[job_id] = text
+            for job_id in set(texts) - set(self._texts):
+                self._pending[job_id] = None
+            self._rebuilding = False
+        print(f"Index sémantique reconstruit ({len(ids)} offres)")
+
+    def _start_rebuild(self):
+        if self._rebuilding:
+            return
+        self._rebuilding = True
+
+        def run():
+            try:
+                self.rebuild()
+            except Exception as e:
+                self._rebuilding = False
+                print(f"Erreur reconstruction index sémantique: {e}")
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _persist(self, embedder, ivf):
+        tmp = self.path + '.tmp'
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        embedder.save(tmp)
+        ivf.save(tmp)
+        old = self.path + '.old'
+        shutil.rmtree(old, ignore_errors=True)
+        if os.path.exists(self.path):
+            os.replace(self.path, old)
+        os.replace(tmp, self.path)
+        shutil.rmtree(old, ignore_errors=True)
+
+    # --- Requête ---
+    def search(self, data, top_k=20, min_score=0):
+        """[(job_id, score)] par similarité cosinus (score en %)."""
+        self.ensure_ready()
+        with self._lock:
+            embedder, ivf = self.embedder, self.ivf
+            delta = dict(self._delta)
+            excluded = set(self._removed) | set(delta)
+        query = embedder.transform([cv_text(data)])[0]
+        hits = ivf.search(query, top_k, exclude=excluded)
+        hits.extend((job_id, float(vector @ query)) for job_id, vector in delta.items())
+        hits.sort(key=lambda h: h[1], reverse=True)
+        results = []
+        for job_id, sim in hits[:top_k]:
+            score = round(max(sim, 0.0) * 100, 2)
+            if score >= min_score:
+                results.append((job_id, score))
+        return results
@@ -0,0 +1,215 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from common.skills import canonicalize_skills, to_bitset
+
+# Intervalle de rechargement complet quand l'écoute temps réel Firestore
+# n'est pas disponible (émulateur, droits insuffisants, ...)
+REFRESH_SECONDS = int(os.getenv("MATCHING_INDEX_REFRESH_SECONDS", "300"))
+
+
+class IndexUnavailable(RuntimeError):
+    """L'index n'a pas pu être chargé (Firestore injoignable, identifiants absents...)."""
+
+
+class SkillIndex:
+    """Index inversé compétence -> documents, gardé en mémoire.
+
+    Les compétences sont canonicalisées puis internées dans `vocabulary` :
+    chaque document est stocké en array('I') trié et en bitset, et l'index
+    inversé est indexé par identifiant entier.
+
+    Chargé une seule fois puis tenu à jour de façon incrémentale par un
+    listener Firestore (on_snapshot). Si le listener ne peut pas démarrer,
+    l'index se recharge périodiquement et peut être mis à jour à la main
+    via upsert() / remove().
+    """
+
+    def __init__(self, db, collection, vocabulary, field="skills"):
+        self.db = db
+        self.collection = collection
+        self.vocabulary = vocabulary
+        self.field = field
+        self._lock = threading.RLock()
+        self._docs = {}       # doc_id -> liste des compétences (telles que saisies)
+        self._ids = {}        # doc_id -> array('I') des identifiants canoniques
+        self._bits = {}       # doc_id -> bitset des identifiants
+        self._hashes = {}     # doc_id -> empreinte du document complet
+        self._by_skill = {}   # identifiant -> set(doc_id)
+        self._loaded = threading.Event()
+        self._started = False
+        self._watch = None
+        self._listeners = []
+        self.version = 0
+
+    def add_listener(self, callback):
+        """callback(doc_id, data) à chaque modification ; data vaut None si supprimé."""
+        self._listeners.append(callback)
+
+    # --- Démarrage ---
+    def start(self, timeout=30):
+        """Charge l'index au premier appel ; lève IndexUnavailable s'il n'est pas prêt.
+
+        Si le chargement échoue, le prochain appel (ou un thread en attente)
+        le retente au lieu de servir un index vide.
+        """
+        deadline = time.monotonic() + timeout
+        while not self._loaded.is_set():
+            with self._lock:
+                first = not self._started
+                self._started = True
+            if first:
+                try:
+                    self._load(timeout)
+                except Exception as e:
+                    with self._lock:
+                        self._started = False
+                    raise IndexUnavailable(f"Index '{self.collection}' indisponible: {e}") from e
+                return
+            # Un autre thread charge déjà l'index : on attend qu'il soit prêt
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise IndexUnavailable(f"Index '{self.collection}' non chargé après {timeout} s")
+            self._loaded.wait(min(remaining, 0.5))
+
+    def _load(self, timeout):
+        try:
+            self._watch = self.db.collection(self.collection).on_snapshot(self._on_snapshot)
+            if not self._loaded.wait(timeout):
+                raise TimeoutError("premier snapshot non reçu")
+            print(f"Index '{self.collection}' chargé via listener ({len(self._docs)} documents)")
+        except Exception as e:
+            print(f"Listener '{self.collection}' indisponible ({e}), rechargement périodique")
+            if self._watch is not None:
+                try:
+                    self._watch.unsubscribe()
+                except Exception:
+                    pass
+                self._watch = None
+            self.reload()
+            threading.Thread(target=self._poll, daemon=True).start()
+
+    def stop(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    def reload(self):
+        docs = {doc.id: (doc.to_dict() or {}) for doc in self.db.collection(self.collection).stream()}
+        with self._lock:
+            for doc_id in list(self._docs):
+                if doc_id not in docs:
+                    self._remove(doc_id)
+            for doc_id, data in docs.items():
+                self._upsert(doc_id, data)
+            self.version += 1
+        self._loaded.set()
+
+    def _poll(self):
+        while True:
+            time.sleep(REFRESH_SECONDS)
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"Erreur rechargement index '{self.collection}': {e}")
+
+    # --- Callback Firestore ---
+    def _on_snapshot(self, doc_snapshots, changes, read_time):
+        with self._lock:
+            for change in changes:
+                if change.type.name == 'REMOVED':
+                    self._remove(change.document.id)
+                else:
+                    self._upsert(change.document.id, change.document.to_dict() or {})
+            self.version += 1
+        self._loaded.set()
+
+    # --- Mises à jour manuelles (stand-in local du listener) ---
+    def upsert(self, doc_id, data):
+        with self._lock:
+            self._upsert(doc_id, data)
+            self.version += 1
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove(doc_id)
+            self.version += 1
+
+    def encode(self, data):
+        """(array('I'), bitset) des compétences canoniques d'un document.
+
+        Toujours recanonicalisé depuis `skills`, comme recompute_matches.py :
+        le champ skills_canonical stocké reflète la taxonomie de son écriture.
+        """
+        skill_ids = self.vocabulary.encode(canonicalize_skills(data.get(self.field, [])))
+        return skill_ids, to_bitset(skill_ids)
+
+    def _upsert(self, doc_id, data):
+        digest = hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        if self._hashes.get(doc_id) == digest:
+            # Document rejoué à l'identique (premier snapshot, rechargement)
+            return
+        self._remove(doc_id, notify=False)
+        self._hashes[doc_id] = digest
+        skill_ids, bits = self.encode(data)
+        self._docs[doc_id] = list(data.get(self.field, []) or [])
+        self._ids[doc_id] = skill_ids
+        self._bits[doc_id] = bits
+        for skill_id in skill_ids:
+            self._by_skill.setdefault(skill_id, set()).add(doc_id)
+        self._notify(doc_id, data)
+
+    def _remove(self, doc_id, notify=True):
+        if notify and doc_id in self._docs:
+            self._notify(doc_id, None)
+        self._docs.pop(doc_id, None)
+        self._bits.pop(doc_id, None)
+        self._hashes.pop(doc_id, None)
+        old = self._ids.pop(doc_id, None)
+        if old is None:
+            return
+        for skill_id in old:
+            docs = self._by_skill.get(skill_id)
+            if docs is not None:
+                docs.discard(doc_id)
+                if not docs:
+                    del self._by_skill[skill_id]
+
+    def _notify(self, doc_id, data):
+        for callback in self._listeners:
+            try:
+                callback(doc_id, data)
+            except Exception as e:
+                print(f"Erreur listener index '{self.collection}': {e}")
+
+    # --- Lecture ---
+    def candidates(self, skill_ids):
+        """Documents partageant au moins une compétence avec `skill_ids`."""
+        with self._lock:
+            found = set()
+            for skill_id in skill_ids:
+                found |= self._by_skill.get(skill_id, set())
+            return found
+
+    def snapshot(self):
+        """Copie cohérente (version, {doc_id: array('I')}) de l'index."""
+        with self._lock:
+            return self.version, dict(self._ids)
+
+    def skills_of(self, doc_id):
+        with self._lock:
+            return self._docs.get(doc_id)
+
+    def ids_of(self, doc_id):
+        with self._lock:
+            return self._ids.get(doc_id)
+
+    def bits_of(self, doc_id):
+        with self._lock:
+            return self._bits.get(doc_id)
+
+    def __len__(self):
+        return len(self._docs)
@@ -1,24 +1,24 @@
+import time
+_import_started = time.perf_counter()
+
 from flask import Flask, request, jsonify
-import firebase_admin
-from firebase_admin import credentials, firestore
+import os
+import sys
 import uuid
 from flask_cors import CORS
 import logging
 from datetime import datetime
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from common.bootstrap import Lazy, firestore_client, firestore_module, is_available, startup
+
 # Configuration des logs
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-# Initialisation Firebase
-try:
-    cred = credentials.Certificate("../../firebase/firebase_admin_key.json")
-    firebase_admin.initialize_app(cred)
-    db = firestore.client()
-    logger.info("Firebase Admin SDK initialized successfully.")
-except Exception as e:
-    logger.error(f"Error initializing Firebase Admin SDK: {e}")
-    db = None
+# Initialisation Firebase : le client est créé au premier usage (ou par le warm-up)
+db = Lazy(firestore_client)
+firestore = Lazy(firestore_module)
 
 app = Flask(__name__)
 CORS(app, resources={
@@ -31,7 +31,7 @@ CORS(app, resources={
 
 @app.route('/notify/new-job', methods=['POST'])
 def notify_new_job():
-    if not db:
+    if not is_available(firestore_client):
         return jsonify({'error': 'Firestore client not initialized'}), 500
 
     data = request.get_json()
@@ -77,7 +77,7 @@ def notify_new_job():
 
 @app.route('/notifications/user/<user_id>', methods=['GET'])
 def get_user_notifications(user_id):
-    if not db:
+    if not is_available(firestore_client):
         return jsonify({'error': 'Firestore client not initialized'}), 500
 
     try:
@@ -100,7 +100,7 @@ def get_user_notifications(user_id):
 
 @app.route('/notifications/<notification_id>/read', methods=['PUT'])
 def mark_notification_as_read(notification_id):
-    if not db:
+    if not is_available(firestore_client):
         return jsonify({'error': 'Firestore client not initialized'}), 500
 
     try:
@@ -116,8 +116,7 @@ def mark_notification_as_read(notification_id):
         return jsonify({'error': 'Failed to update notification'}), 500
 
 
+startup('NotificationService', _import_started, firestore_client)
+
 if __name__ == '__main__':
-    if not db:
-        logger.critical("Failed to initialize Firestore. NotificationService cannot start.")
-    else:
-        app.run(port=5008, debug=True)
\ No newline at end of file
+    app.run(port=5008, debug=True)
\ No newline at end of file
@@ -0,0 +1,120 @@
+"""Initialisation paresseuse et partagée des clients (Firebase, Firestore, Gemini, PyPDF2).
+
+Chaque client est créé au premier usage, une seule fois par processus : tous
+les modules d'un service partagent ainsi le même client Firestore (et son
+canal gRPC). Une clé absente ne fait plus planter l'import du service, seule
+la requête qui a besoin du client échoue.
+"""
+import os
+import threading
+import time
+
+CREDENTIALS_PATH = os.getenv("FIREBASE_CREDENTIALS", os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..', 'firebase', 'firebase_admin_key.json')))
+WARMUP = os.getenv("BOOTSTRAP_WARMUP", "1") == "1"
+
+_lock = threading.RLock()
+_clients = {}
+init_times = {}   # nom du client -> secondes
+
+
+def _init_once(name, factory):
+    client = _clients.get(name)
+    if client is not None:
+        return client
+    with _lock:
+        if name not in _clients:
+            started = time.perf_counter()
+            _clients[name] = factory()
+            init_times[name] = time.perf_counter() - started
+        return _clients[name]
+
+
+# --- Clients ---
+def firebase_app():
+    def create():
+        import firebase_admin
+        from firebase_admin import credentials
+        if firebase_admin._apps:
+            return firebase_admin.get_app()
+        return firebase_admin.initialize_app(credentials.Certificate(CREDENTIALS_PATH))
+    return _init_once('firebase', create)
+
+
+def firestore_module():
+    def create():
+        from firebase_admin import firestore
+        return firestore
+    return _init_once('firestore_module', create)
+
+
+def firestore_client():
+    def create():
+        firebase_app()
+        return firestore_module().client()
+    return _init_once('firestore', create)
+
+
+def firebase_auth():
+    def create():
+        firebase_app()
+        from firebase_admin import auth
+        return auth
+    return _init_once('auth', create)
+
+
+def gemini_model(name):
+    def create():
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        return genai.GenerativeModel(name)
+    return _init_once(f'gemini:{name}', create)
+
+
+def pdf_module():
+    def create():
+        import PyPDF2
+        return PyPDF2
+    return _init_once('PyPDF2', create)
+
+
+class Lazy:
+    """Mandataire : l'objet réel n'est créé qu'au premier accès à un attribut.
+
+    `db = Lazy(firestore_client)` s'utilise ensuite comme le client lui-même
+    (db.collection(...), db.batch()...).
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+
+    def __getattr__(self, name):
+        return getattr(self._factory(), name)
+
+
+def is_available(factory):
+    """True si le client peut être créé (l'erreur est affichée sinon)."""
+    try:
+        factory()
+        return True
+    except Exception as e:
+        print(f"Client indisponible ({getattr(factory, '__name__', factory)}): {e}")
+        return False
+
+
+# --- Démarrage ---
+def startup(service, import_started, *factories):
+    """Affiche le temps d'import du service puis initialise les clients en arrière-plan."""
+    print(f"[{service}] import: {(time.perf_counter() - import_started) * 1000:.0f} ms")
+    if not WARMUP or not factories:
+        return None
+
+    def warm():
+        for factory in factories:
+            is_available(factory)
+        timings = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in init_times.items())
+        print(f"[{service}] init: {timings or 'aucun client'}")
+
+    thread = threading.Thread(target=warm, name=f'{service}-warmup', daemon=True)
+    thread.start()
+    return thread
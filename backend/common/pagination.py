@@ -0,0 +1,135 @@
+"""Outils communs de pagination et de réponse en flux (NDJSON)."""
+import base64
+import json
+import re
+from datetime import datetime
+
+from flask import Response, request
+
+# Taille de page par défaut quand seul `start_after` est fourni, et plafond de `limit`
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 1000
+_FIELD_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_.]*$")
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(value):
+    """Jeton opaque (base64 url) pour une valeur JSON."""
+    raw = json.dumps(value, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        return json.loads(raw)
+    except Exception:
+        raise InvalidCursor(f"Cursor invalide: {token}")
+
+
+def parse_fields(raw):
+    """'a,b' -> ['a', 'b'] ; None si aucun filtre demandé."""
+    if not raw:
+        return None
+    return [f.strip() for f in raw.split(',') if f.strip()]
+
+
+def project(item, fields):
+    if fields is None:
+        return item
+    return {f: item[f] for f in fields if f in item}
+
+
+def wants_ndjson():
+    return (request.args.get('format') == 'ndjson'
+            or 'application/x-ndjson' in request.headers.get('Accept', ''))
+
+
+def ndjson_response(items, headers=None):
+    """Réponse NDJSON : une ligne JSON par élément, envoyée au fil de l'eau."""
+    def generate():
+        for item in items:
+            yield json.dumps(item, default=str, ensure_ascii=False) + '\n'
+    return Response(generate(), mimetype='application/x-ndjson', headers=headers)
+
+
+# --- Listes Firestore : tri, cursor, limite et projection ---
+def list_params():
+    """Lit limit / start_after / order_by / fields ; lève ValueError si invalide."""
+    limit = request.args.get('limit', type=int)
+    start_after = request.args.get('start_after')
+    if limit is not None:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+    elif start_after:
+        limit = DEFAULT_PAGE_SIZE
+    order_by = request.args.get('order_by') or '__name__'
+    if not _FIELD_NAME.match(order_by.lstrip('-')):
+        raise ValueError(f"order_by invalide: {order_by}")
+    return {
+        'limit': limit,
+        'start_after': start_after,
+        'order_by': order_by,
+        'fields': parse_fields(request.args.get('fields'))
+    }
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'$dt': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and '$dt' in value:
+        return datetime.fromisoformat(value['$dt'])
+    return value
+
+
+def query_page(query, limit=None, start_after=None, order_by='__name__', fields=None):
+    """Applique tri, cursor, limite et projection (select) à une requête Firestore.
+
+    Retourne (snapshots, jeton de la page suivante ou None). Sans `limit`,
+    les snapshots sont un flux (stream) sur tout le résultat. `order_by`
+    accepte '-champ' pour un tri décroissant ; l'id du document départage
+    les égalités, ce qui rend le cursor stable.
+    """
+    field = order_by.lstrip('-')
+    direction = 'DESCENDING' if order_by.startswith('-') else 'ASCENDING'
+    if field != '__name__':
+        query = query.order_by(field, direction=direction)
+    query = query.order_by('__name__', direction=direction)
+
+    cursor = decode_cursor(start_after)
+    if cursor is not None:
+        if not isinstance(cursor, dict) or cursor.get('o') != order_by or 'id' not in cursor:
+            raise InvalidCursor("Cursor invalide pour ce tri")
+        values = [] if field == '__name__' else [_decode_value(cursor.get('v'))]
+        query = query.start_after(values + [cursor['id']])
+
+    if fields is not None:
+        # Le champ de tri est lu pour construire le cursor, même s'il n'est pas demandé
+        selected = {f for f in fields if f != 'id'}
+        if field != '__name__':
+            selected.add(field)
+        query = query.select(sorted(selected))
+
+    if limit is None:
+        return query.stream(), None
+
+    # Un document de plus pour savoir s'il reste une page
+    docs = list(query.limit(limit + 1).stream())
+    if len(docs) <= limit:
+        return docs, None
+    docs = docs[:limit]
+    last = docs[-1]
+    token = encode_cursor({
+        'o': order_by,
+        'v': None if field == '__name__' else _encode_value(last.get(field)),
+        'id': last.id
+    })
+    return docs, token
@@ -0,0 +1,267 @@
+"""Canonicalisation des compétences partagée entre les services.
+
+Une compétence libre ("Python3", " python ", "Apprentissage automatique")
+est ramenée à une clé canonique ("python", "machine learning") :
+  1. pliage casse / accents / espaces,
+  2. dictionnaire d'alias,
+  3. normaliseur de phrases par trie (plus long préfixe en tokens) pour
+     retrouver les compétences connues dans un libellé composé
+     ("Python / Django et SQL").
+
+SkillVocabulary associe ensuite chaque clé canonique à un identifiant
+entier compact, pour stocker les profils en array('I') triés ou en
+bitsets (int Python) et calculer les intersections par popcount.
+"""
+import re
+import threading
+import unicodedata
+from array import array
+
+# Clé canonique -> alias connus (en plus de la clé elle-même)
+SKILL_ALIASES = {
+    "python": ["python3", "python 3", "py"],
+    "java": ["java se", "java ee", "jee", "j2ee"],
+    "javascript": ["js", "es6", "ecmascript", "vanilla js"],
+    "typescript": ["ts"],
+    "c": ["langage c"],
+    "c++": ["cpp", "c plus plus"],
+    "c#": ["csharp", "c sharp"],
+    "php": [],
+    "ruby": [],
+    "go": ["golang"],
+    "rust": [],
+    "kotlin": [],
+    "swift": [],
+    "scala": [],
+    "r": ["langage r"],
+    "matlab": [],
+    "dart": [],
+    "sql": ["langage sql"],
+    "html": ["html5"],
+    "css": ["css3"],
+    "sass": ["scss"],
+    "tailwind css": ["tailwind", "tailwindcss"],
+    "bootstrap": [],
+    "react": ["reactjs", "react.js", "react js"],
+    "react native": [],
+    "angular": ["angularjs", "angular.js"],
+    "vue.js": ["vue", "vuejs", "vue js"],
+    "next.js": ["nextjs", "next"],
+    "node.js": ["node", "nodejs", "node js"],
+    "express": ["express.js", "expressjs"],
+    "django": [],
+    "flask": [],
+    "fastapi": [],
+    "spring boot": ["springboot", "spring"],
+    "laravel": [],
+    "symfony": [],
+    ".net": ["dotnet", "asp.net", "asp.net core", ".net core"],
+    "flutter": [],
+    "android": [],
+    "ios": [],
+    "mysql": [],
+    "postgresql": ["postgres", "postgre sql", "psql"],
+    "mongodb": ["mongo", "mongo db"],
+    "oracle": ["oracle db", "pl/sql", "plsql"],
+    "sqlite": [],
+    "redis": [],
+    "firebase": ["firestore"],
+    "elasticsearch": ["elastic search"],
+    "docker": [],
+    "kubernetes": ["k8s"],
+    "git": ["github", "gitlab"],
+    "ci/cd": ["ci cd", "integration continue", "jenkins", "github actions", "gitlab ci"],
+    "linux": ["unix", "ubuntu"],
+    "aws": ["amazon web services"],
+    "azure": ["microsoft azure"],
+    "gcp": ["google cloud", "google cloud platform"],
+    "terraform": [],
+    "ansible": [],
+    "rest api": ["api rest", "restful", "rest", "restful api"],
+    "graphql": [],
+    "microservices": ["micro services", "micro-services", "architecture microservices"],
+    "uml": [],
+    "merise": [],
+    "agile": ["methode agile", "methodes agiles"],
+    "scrum": [],
+    "machine learning": ["ml", "apprentissage automatique"],
+    "deep learning": ["apprentissage profond"],
+    "intelligence artificielle": ["ia", "ai", "artificial intelligence"],
+    "nlp": ["traitement automatique du langage", "natural language processing"],
+    "computer vision": ["vision par ordinateur"],
+    "data science": ["science des donnees"],
+    "data analysis": ["analyse de donnees", "data analytics"],
+    "big data": [],
+    "spark": ["apache spark", "pyspark"],
+    "hadoop": [],
+    "pandas": [],
+    "numpy": [],
+    "scikit-learn": ["sklearn", "scikit learn"],
+    "tensorflow": [],
+    "pytorch": ["torch"],
+    "power bi": ["powerbi"],
+    "tableau": [],
+    "excel": ["ms excel", "microsoft excel"],
+    "figma": [],
+    "cybersecurite": ["cybersecurity", "securite informatique"],
+    "reseaux": ["networking", "reseau", "tcp/ip"],
+    "gestion de projet": ["project management", "gestion des projets"],
+    "communication": [],
+    "travail en equipe": ["teamwork", "esprit d'equipe"],
+    "anglais": ["english"],
+    "francais": ["french"],
+}
+
+_SPACES = re.compile(r"\s+")
+_VERSION_SUFFIX = re.compile(r"^(.*?[a-z+#])\s*v?\d+(?:\.\d+)*$")
+_TOKEN = re.compile(r"[a-z0-9+#./'-]+")
+_SEPARATORS = re.compile(r"\s*(?:[,;|/]|\bet\b|\band\b|&)\s*")
+
+# Dans du texte libre, un alias ne compte que s'il fait au moins
+# _MIN_FREE_TEXT_ALIAS caractères et n'est pas aussi un mot courant
+# ("next steps", "rest du monde", "tableau de bord") ; le libellé exact
+# ("Node", "REST") reste reconnu par le dictionnaire.
+_MIN_FREE_TEXT_ALIAS = 3
+_AMBIGUOUS_IN_TEXT = {"next", "node", "rest", "spring", "vue", "express", "torch", "tableau"}
+
+
+def fold(text):
+    """Minuscules, sans accents, espaces réduits."""
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _SPACES.sub(" ", text.lower()).strip(" -•*:").rstrip(".")
+
+
+def _tokens(text):
+    return [t.rstrip(".") for t in _TOKEN.findall(text) if t.rstrip(".")]
+
+
+class _PhraseTrie:
+    """Trie sur les tokens : retrouve les plus longues phrases connues."""
+
+    def __init__(self):
+        self.root = {}
+
+    def add(self, phrase, canonical):
+        node = self.root
+        for token in _tokens(phrase):
+            node = node.setdefault(token, {})
+        node[None] = (canonical, phrase)
+
+    def scan(self, text):
+        """Liste des (clé canonique, alias reconnu) du texte."""
+        tokens = _tokens(text)
+        found = []
+        i = 0
+        while i < len(tokens):
+            node, j, match, end = self.root, i, None, i
+            while j < len(tokens) and tokens[j] in node:
+                node = node[tokens[j]]
+                j += 1
+                if None in node:
+                    match, end = node[None], j
+            if match is not None:
+                found.append(match)
+                i = end
+            else:
+                i += 1
+        return found
+
+
+_ALIAS_TO_CANONICAL = {}
+_TRIE = _PhraseTrie()
+for _canonical, _aliases in SKILL_ALIASES.items():
+    for _alias in [_canonical] + _aliases:
+        _ALIAS_TO_CANONICAL[fold(_alias)] = _canonical
+        _TRIE.add(fold(_alias), _canonical)
+
+
+def _lookup(key):
+    if key in _ALIAS_TO_CANONICAL:
+        return _ALIAS_TO_CANONICAL[key]
+    versioned = _VERSION_SUFFIX.match(key)
+    if versioned:
+        return _ALIAS_TO_CANONICAL.get(versioned.group(1))
+    return None
+
+
+def canonicalize(skill):
+    """Liste des clés canoniques contenues dans un libellé de compétence."""
+    key = fold(skill)
+    if not key:
+        return []
+    known = _lookup(key)
+    if known:
+        return [known]
+
+    # Libellé composé : "Python / Django et SQL"
+    parts = [p for p in _SEPARATORS.split(key) if p]
+    if len(parts) > 1:
+        result = []
+        for part in parts:
+            result.extend(canonicalize(part))
+        return result
+
+    # Recherche des phrases connues dans le libellé ("Maîtrise de Docker").
+    # Les alias très courts ("c", "r", "ia") ou ambigus ("next", "rest") ne
+    # comptent pas dans du texte libre pour éviter les faux positifs.
+    phrases = [canonical for canonical, alias in _TRIE.scan(key)
+               if len(alias) >= _MIN_FREE_TEXT_ALIAS and alias not in _AMBIGUOUS_IN_TEXT]
+    if phrases:
+        return phrases
+    versioned = _VERSION_SUFFIX.match(key)
+    return [versioned.group(1) if versioned else key]
+
+
+def canonicalize_skills(skills):
+    """Clés canoniques uniques, dans l'ordre d'apparition."""
+    seen = {}
+    for skill in skills or []:
+        for key in canonicalize(skill):
+            seen.setdefault(key, None)
+    return list(seen)
+
+
+class SkillVocabulary:
+    """Interne les clés canoniques en identifiants entiers compacts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = {}
+        self._names = []
+
+    def id_of(self, key):
+        skill_id = self._ids.get(key)
+        if skill_id is None:
+            with self._lock:
+                skill_id = self._ids.get(key)
+                if skill_id is None:
+                    skill_id = len(self._names)
+                    self._names.append(key)
+                    self._ids[key] = skill_id
+        return skill_id
+
+    def name_of(self, skill_id):
+        return self._names[skill_id]
+
+    def encode(self, canonical_skills):
+        """array('I') trié des identifiants de compétences canoniques."""
+        return array('I', sorted({self.id_of(key) for key in canonical_skills}))
+
+    def __len__(self):
+        return len(self._names)
+
+
+def to_bitset(skill_ids):
+    bits = 0
+    for skill_id in skill_ids:
+        bits |= 1 << skill_id
+    return bits
+
+
+def overlap_score(candidate_bits, job_bits):
+    """Pourcentage des compétences de l'offre couvertes par le candidat."""
+    job_count = job_bits.bit_count()
+    if not candidate_bits or not job_count:
+        return 0
+    return round(((candidate_bits & job_bits).bit_count() / job_count) * 100, 2)